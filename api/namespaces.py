@@ -1,9 +1,20 @@
-from flask_restx import Resource, fields
+from flask_restx import Resource, fields, marshal, reqparse
 from extensions import api
-from models import Session, Question, Quiz, QuizResponse
-from flask import jsonify, current_app
-from datetime import datetime
-from extensions import redis_client, socketio, db
+from models import Session, Question, Quiz
+from flask import jsonify, current_app, make_response, request
+from datetime import datetime, timezone
+from extensions import db, redis_pipeline
+from services.snapshot import invalidate_snapshot
+from services.transcript import record_question, get_transcript
+from services.presence import get_presence
+from services.responses import submit_response
+from services.analytics import quiz_results, session_report
+from services.leaderboard import get_top, get_position
+from services.broadcast import record_answer
+from services.current_session import get_current_session
+from services.ratelimit import check_question_rate
+from services.pagination import keyset_page
+from services.payloads import emit_to_session
 
 # Création des namespaces
 ns_session = api.namespace('sessions', description='Session operations')
@@ -37,94 +48,138 @@ question_model = api.model('Question', {
     'timestamp': fields.DateTime
 })
 
+quiz_page_model = api.model('QuizPage', {
+    'items': fields.List(fields.Nested(quiz_model)),
+    'next': fields.String
+})
+
+# Pagination par curseur (timestamp, id)
+page_parser = reqparse.RequestParser()
+page_parser.add_argument('limit', type=int, location='args', help='Taille de page (max 200)')
+page_parser.add_argument('after', type=str, location='args', help='Curseur "next" de la page précédente')
+page_parser.add_argument('order', type=str, location='args', choices=('asc', 'desc'), default='asc')
+
+leaderboard_parser = reqparse.RequestParser()
+leaderboard_parser.add_argument('limit', type=int, location='args', help='Nombre d\'appareils du classement (max 100)')
+leaderboard_parser.add_argument('device_id', type=str, location='args', help='Appareil dont on veut le rang')
+
 # Ressources API
 @ns_session.route('/current')
 class CurrentSession(Resource):
     @ns_session.doc('get_current_session')
-    @ns_session.marshal_with(session_model)
+    @ns_session.response(200, 'Session en direct', session_model)
+    @ns_session.response(304, 'Non modifiée depuis If-None-Match / If-Modified-Since')
+    @ns_session.response(404, 'Aucune session en direct')
     def get(self):
-        session = Session.query.filter_by(status='live').first()
-        if session:
-            return {
-                'id': session.id,
-                'title': session.title,
-                'description': session.description,
-                'start_time': session.start_time,
-                'end_time': session.end_time,
-                'status': session.status,
-                'stream_key': session.stream_key,
-                'user_id': session.user_id,
-                'hls_url': f"http://{current_app.config['SRS_SERVER']}:{current_app.config['SRS_HTTP_PORT']}/live/{session.stream_key}.m3u8"
-            }
-        return {'message': 'No live session'}, 404
+        # Représentation en cache Redis : le poll des téléviseurs ne touche pas la base
+        entry = get_current_session(session_model)
+        response = make_response(entry['body'], entry['status'])
+        response.mimetype = 'application/json'
+        response.set_etag(entry['etag'])
+        response.last_modified = datetime.fromtimestamp(entry['last_modified'], timezone.utc)
+        response.cache_control.no_cache = True
+        # Le 404 « aucune session » aussi : c'est la réponse du poll au repos
+        response.make_conditional(request)
+        return response
 
 @ns_question.route('/<int:session_id>/question')
 class QuestionOperations(Resource):
     @ns_question.expect(api.model('QuestionInput', {
-        'question_text': fields.String(required=True)
+        'question_text': fields.String(required=True),
+        'device_id': fields.String
     }))
     @ns_question.doc('submit_question')
+    @ns_question.response(429, 'Trop de questions (voir Retry-After)')
     def post(self, session_id):
         data = api.payload
         question_text = data['question_text']
+        allowed, retry_after = check_question_rate(session_id, data.get('device_id') or request.remote_addr)
+        if not allowed:
+            return {
+                'status': 'error',
+                'message': 'Trop de questions, réessayez plus tard',
+                'retry_after': retry_after
+            }, 429, {'Retry-After': str(retry_after)}
         question = Question(session_id=session_id, question_text=question_text, timestamp=datetime.now())
         db.session.add(question)
         db.session.commit()
-        redis_client.rpush(f"session:{session_id}:questions", f"Q:{question_text}|A:")
-        socketio.emit('new_question', {
+        with redis_pipeline() as pipe:
+            record_question(pipe, question)
+            invalidate_snapshot(session_id, pipe=pipe)
+        emit_to_session('new_question', {
             'session_id': session_id,
             'question_id': question.id,
             'question_text': question_text,
-            'timestamp': question.timestamp.isoformat()
-        }, room=f'session_{session_id}')
+            'timestamp': question.timestamp
+        }, session_id)
         return {'status': 'success', 'question_id': question.id}, 201
 
     @ns_question.doc('get_session_questions')
+    @ns_question.expect(page_parser)
     def get(self, session_id):
-        questions = Question.query.filter_by(session_id=session_id).order_by(Question.timestamp.asc()).all()
-        return jsonify([{
-            'id': q.id,
-            'question_text': q.question_text,
-            'answer_text': q.answer_text,
-            'timestamp': q.timestamp.isoformat()
-        } for q in questions])
+        args = page_parser.parse_args()
+        try:
+            questions, next_cursor = keyset_page(
+                Question.query.filter_by(session_id=session_id), Question,
+                after=args['after'], limit=args['limit'], descending=args['order'] == 'desc'
+            )
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        return jsonify({
+            'items': [{
+                'id': q.id,
+                'question_text': q.question_text,
+                'answer_text': q.answer_text,
+                'timestamp': q.timestamp.isoformat()
+            } for q in questions],
+            'next': next_cursor
+        })
 
 @ns_session.route('/<int:session_id>/quizzes')
 class SessionQuizzes(Resource):
     @ns_session.doc('get_session_quizzes')
-    @ns_session.marshal_list_with(quiz_model)
+    @ns_session.expect(page_parser)
     def get(self, session_id):
-        quizzes = Quiz.query.filter_by(session_id=session_id).all()
-        return [{
-            'id': quiz.id,
-            'question': quiz.question,
-            'options': quiz.options,
-            'correct_answer': quiz.correct_answer
-        } for quiz in quizzes]
+        args = page_parser.parse_args()
+        try:
+            quizzes, next_cursor = keyset_page(
+                Quiz.query.filter_by(session_id=session_id), Quiz,
+                after=args['after'], limit=args['limit'], descending=args['order'] == 'desc'
+            )
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        return marshal({
+            'items': [{
+                'id': quiz.id,
+                'question': quiz.question,
+                'options': quiz.options,
+                'correct_answer': quiz.correct_answer
+            } for quiz in quizzes],
+            'next': next_cursor
+        }, quiz_page_model)
 
 @ns_session.route('/<int:session_id>/quiz/<int:quiz_id>/response')
 class QuizResponseAPI(Resource):
     @ns_session.expect(api.model('QuizResponseInput', {
-        'selected_option': fields.Integer(required=True)
+        'selected_option': fields.Integer(required=True),
+        'device_id': fields.String
     }))
     @ns_session.doc('submit_quiz_response')
+    @ns_session.response(400, 'Option invalide ou appareil ayant déjà répondu')
+    @ns_session.response(404, 'Quiz introuvable dans cette session')
     def post(self, session_id, quiz_id):
         data = api.payload
         selected_option = data['selected_option']
-        response = QuizResponse(
-            quiz_id=quiz_id,
-            user_id=None,
-            selected_option=selected_option,
-            timestamp=datetime.now()
-        )
-        db.session.add(response)
-        db.session.commit()
-        redis_client.rpush(f"session:{session_id}:quiz_responses", f"Q:{quiz_id}|A:{selected_option}")
-        socketio.emit('new_quiz_response', {
-            'session_id': session_id,
-            'quiz_id': quiz_id,
-            'selected_option': selected_option
-        }, room=f'session_{session_id}')
+        device_id = data.get('device_id')
+        try:
+            submitted = submit_response(quiz_id, selected_option, device_id=device_id, session_id=session_id)
+        except LookupError as e:
+            return {'status': 'error', 'message': str(e)}, 404
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        if not submitted:
+            return {'status': 'error', 'message': 'Vous avez déjà répondu à ce quiz'}, 400
+        record_answer(session_id, quiz_id)
         return {'status': 'success'}, 201
 
 @ns_session.route('/<int:session_id>/quiz/<int:quiz_id>/results')
@@ -133,17 +188,49 @@ class QuizResults(Resource):
     def get(self, session_id, quiz_id):
         session = Session.query.get_or_404(session_id)
         quiz = Quiz.query.filter_by(id=quiz_id, session_id=session_id).first_or_404()
-        responses = QuizResponse.query.filter_by(quiz_id=quiz_id).all()
-        results = [0] * len(quiz.options)
-        for response in responses:
-            results[response.selected_option] += 1
+        return jsonify(quiz_results(quiz))
+
+@ns_session.route('/<int:session_id>/report')
+class SessionReport(Resource):
+    @ns_session.doc('get_session_report')
+    def get(self, session_id):
+        # Lu dans QuizStats/SessionStats : O(quiz), indépendant du nombre de réponses
+        Session.query.get_or_404(session_id)
+        return jsonify(session_report(session_id))
+
+@ns_session.route('/<int:session_id>/leaderboard')
+class SessionLeaderboard(Resource):
+    @ns_session.doc('get_session_leaderboard')
+    @ns_session.expect(leaderboard_parser)
+    def get(self, session_id):
+        # Sorted set Redis pendant la session (O(log n)), instantané en base après sa fin
+        Session.query.get_or_404(session_id)
+        args = leaderboard_parser.parse_args()
+        limit = min(max(args['limit'] or current_app.config['LEADERBOARD_TOP_N'], 1), 100)
         return jsonify({
-            'quiz_id': quiz_id,
-            'question': quiz.question,
-            'options': quiz.options,
-            'results': results
+            'session_id': session_id,
+            'top': get_top(session_id, limit),
+            'position': get_position(session_id, args['device_id']) if args['device_id'] else None
         })
 
+@ns_session.route('/<int:session_id>/transcript')
+class SessionTranscript(Resource):
+    @ns_session.doc('get_session_transcript')
+    @ns_session.response(404, 'Transcript indisponible')
+    def get(self, session_id):
+        Session.query.get_or_404(session_id)
+        transcript = get_transcript(session_id)
+        if transcript is None:
+            return {'status': 'error', 'message': 'Transcript indisponible'}, 404
+        return jsonify(transcript)
+
+@ns_session.route('/<int:session_id>/presence')
+class SessionPresence(Resource):
+    @ns_session.doc('get_session_presence')
+    def get(self, session_id):
+        # Lecture O(1) dans Redis : pas de requête SQL
+        return get_presence([session_id])[session_id]
+
 def load_namespaces():
     # Cette fonction est appelée pour s'assurer que les namespaces sont chargés
     pass
\ No newline at end of file
@@ -1,21 +1,34 @@
-import os
-import socket
 from gevent import monkey  # Ajout pour le monkey patching
 monkey.patch_all()  # Appliquer le patch avant toute autre importation
 
+import logging
 from flask import Flask
 from config import Config
 from extensions import db, migrate, login_manager, socketio, api_bp, init_redis
 from models import User
-from routes import auth_bp, admin_bp, sessions_bp, quizzes_bp, main_bp
+from routes import auth_bp, admin_bp, sessions_bp, quizzes_bp, main_bp, srs_hooks_bp
 from api import namespaces
 from apscheduler.schedulers.background import BackgroundScheduler
-from routes.sessions import check_expired_sessions
+from services.responses import ResponseFlusher
+from services.tallies import reconcile_tallies
+from services.broadcast import TallyCoalescer
+from services.expiry import SessionExpiryEngine
+from services.workers import SocketWorkPool
+from services.presence import PresenceTracker
+from services.monitoring import init_monitoring
+from services.profiling import init_profiling
+from services.metrics import BACKGROUND_JOB_SECONDS
+from services.bootstrap import bootstrap_command
+from services.logging_setup import init_logging
+from services.assets import init_assets
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # Journalisation structurée via une file, avant tout autre journal
+    init_logging(app)
+
     # Initialiser les extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -23,17 +36,17 @@ def create_app():
     login_manager.login_view = 'auth.login'
 
     # Initialiser Redis
-    redis_client = init_redis(app)
+    init_redis(app)
 
     # Configuration de SocketIO
     socketio.init_app(app, 
                       cors_allowed_origins="*", 
                       async_mode='gevent',
-                      logger=True,
-                      engineio_logger=True,
+                      logger=logging.getLogger('socketio.server'),
+                      engineio_logger=logging.getLogger('engineio.server'),
                       ping_timeout=60,
                       ping_interval=25,
-                      message_queue=f'redis://{app.config["REDIS_HOST"]}:{app.config["REDIS_PORT"]}/0')
+                      message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'] or None)
 
     # Enregistrer les blueprints
     app.register_blueprint(auth_bp)
@@ -41,71 +54,87 @@ def create_app():
     app.register_blueprint(sessions_bp)
     app.register_blueprint(quizzes_bp)
     app.register_blueprint(main_bp)
+    app.register_blueprint(srs_hooks_bp)
     app.register_blueprint(api_bp)
 
     # Charger les namespaces de l'API
     namespaces.load_namespaces()
 
+    # Fichiers statiques empreintés (manifeste construit par scripts/build_assets.py)
+    init_assets(app)
+
+    # Métriques Prometheus (routes, événements, SQL, diffusion)
+    init_monitoring(app)
+    init_profiling(app)
+
     # Charger les gestionnaires de sockets
     from sockets import register_handlers
-    register_handlers(socketio, redis_client, db)
+    register_handlers(socketio, db)
 
     @login_manager.user_loader
     def load_user(user_id):
         return db.session.get(User, int(user_id))
 
-    def get_host_ip():
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except:
-            return 'localhost'
+    # Commande de préparation (migrations, admin par défaut), hors du démarrage
+    app.cli.add_command(bootstrap_command)
 
-    # Initialiser le scheduler
-    if not hasattr(app, 'scheduler'):
-        app.scheduler = BackgroundScheduler()
-        app.scheduler.add_job(
-            func=lambda: check_expired_sessions(app),  # Passer l'application
-            trigger='interval',
-            minutes=1,
-            id='session_checker',
-            replace_existing=True
-        )
-        app.scheduler.start()
-
-    # Créer l'admin par défaut dans le contexte de l'application
-    with app.app_context():
-        db.create_all()
-        admin_name = os.getenv('ADMIN_NAME')
-        admin_email = os.getenv('ADMIN_EMAIL')
-        admin_password = os.getenv('ADMIN_PASSWORD')
-        
-        if admin_name and admin_email and admin_password:
-            admin_user = User.query.filter_by(email=admin_email).first()
-            if not admin_user:
-                from werkzeug.security import generate_password_hash
-                hashed_password = generate_password_hash(admin_password)
-                admin_user = User(
-                    username=admin_name,
-                    email=admin_email,
-                    password_hash=hashed_password,
-                    role='admin'
-                )
-                db.session.add(admin_user)
-                db.session.commit()
-                print(f"Admin user {admin_name} created")
-        
-        try:
-            redis_client.ping()
-            print("Redis connection successful")
-        except Exception as e:
-            print(f"Redis connection failed: {str(e)}")
+    # Services toujours présents (les routes et les sockets s'en servent) ;
+    # les commandes CLI (BACKGROUND_SERVICES=false) ne démarrent pas leurs tâches de fond
+    init_background_services(app)
+    if app.config['BACKGROUND_SERVICES']:
+        start_background_services(app)
 
     return app
 
+def init_background_services(app):
+    """Crée les services ; tant qu'ils ne sont pas démarrés, ils travaillent en ligne"""
+    # Pool borné pour les écritures des événements Socket.IO
+    app.socket_workers = SocketWorkPool(app)
+    # Présence des spectateurs par session
+    app.presence = PresenceTracker(app)
+    # Insertion différée des réponses aux quiz
+    app.response_flusher = ResponseFlusher(app)
+    # Diffusion groupée des résultats de quiz
+    app.tally_coalescer = TallyCoalescer(app)
+    # Terminaison des sessions à leur heure de fin (un seul worker élu)
+    app.session_expiry = SessionExpiryEngine(app)
+
+def start_background_services(app):
+    # Idempotent : le scheduler n'existe qu'une fois les tâches de fond démarrées
+    if hasattr(app, 'scheduler'):
+        return
+    app.socket_workers.start()
+    app.presence.start()
+    app.response_flusher.start()
+    app.tally_coalescer.start()
+    app.session_expiry.start()
+
+    # Initialiser le scheduler
+    def tally_reconciler_job():
+        with BACKGROUND_JOB_SECONDS.labels(job='tally_reconciler').time():
+            reconcile_tallies(app)
+
+    app.scheduler = BackgroundScheduler()
+    app.scheduler.add_job(
+        func=tally_reconciler_job,
+        trigger='interval',
+        minutes=app.config['TALLY_RECONCILE_MINUTES'],
+        id='tally_reconciler',
+        replace_existing=True
+    )
+    app.scheduler.start()
+
+def stop_background_services(app):
+    """Vide les files avant l'arrêt du worker (hook worker_exit de gunicorn.conf.py).
+    Appelé pendant que la boucle gevent tourne encore, pas depuis atexit."""
+    # D'abord les tâches Socket.IO en attente, qui mettent des réponses dans le stream
+    app.socket_workers.stop()
+    # Puis le stream des réponses, inséré en base
+    app.response_flusher.stop()
+
 if __name__ == '__main__':
     app = create_app()
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    try:
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    finally:
+        stop_background_services(app)
\ No newline at end of file
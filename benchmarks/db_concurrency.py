@@ -0,0 +1,98 @@
+"""Latence de la boucle gevent pendant des requêtes SQL concurrentes.
+
+Une greenlet « sonde » se réveille toutes les PROBE_INTERVAL secondes, comme le
+ferait l'envoi d'un message websocket ; son retard mesure le temps pendant
+lequel la boucle est restée bloquée. On la mesure au repos, puis pendant que
+--workers greenlets enchaînent des requêtes lentes (SELECT SLEEP sur MySQL).
+
+Exemples :
+    python benchmarks/db_concurrency.py --uri mysql+pymysql://admin:...@db/agri_assist
+    python benchmarks/db_concurrency.py --uri mysql+mysqldb://admin:...@db/agri_assist
+
+Avec mysqlclient (mysqldb) le retard de la sonde suit la durée des requêtes ;
+avec PyMySQL il reste de l'ordre de la milliseconde.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import sys
+import time
+
+import gevent
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config, _engine_options  # noqa: E402
+
+PROBE_INTERVAL = 0.01
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def probe(duration):
+    """Retards (ms) de réveil d'une greenlet qui dort PROBE_INTERVAL en boucle"""
+    lags = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        gevent.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+    return lags
+
+
+def run_queries(engine, query, stop, counter):
+    while not stop[0]:
+        with engine.connect() as conn:
+            conn.execute(text(query)).fetchall()
+        counter[0] += 1
+        gevent.sleep(0)  # point de bascule entre deux requêtes, comme entre deux événements
+
+
+def report(label, lags, queries=None, duration=None):
+    line = (f"{label:<12} p50={percentile(lags, 50):7.2f} ms  p99={percentile(lags, 99):7.2f} ms  "
+            f"max={max(lags, default=0):7.2f} ms")
+    if queries is not None:
+        line += f"  requêtes/s={queries / duration:7.1f}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uri', default=Config.SQLALCHEMY_DATABASE_URI, help="URI SQLAlchemy de la base")
+    parser.add_argument('--workers', type=int, default=20, help="greenlets exécutant des requêtes")
+    parser.add_argument('--duration', type=float, default=5.0, help="durée de chaque mesure (s)")
+    parser.add_argument('--query-ms', type=int, default=50, help="durée de chaque requête SELECT SLEEP (ms)")
+    args = parser.parse_args()
+    if not args.uri:
+        parser.error("--uri ou SQLALCHEMY_DATABASE_URI requis")
+
+    engine = create_engine(args.uri, **_engine_options(args.uri))
+    if engine.dialect.name == 'mysql':
+        query = f"SELECT SLEEP({args.query_ms / 1000.0})"
+    else:
+        query = "SELECT 1"
+    print(f"pilote={engine.dialect.driver} workers={args.workers} requête={query!r}")
+
+    report('repos', probe(args.duration))
+
+    stop, counter = [False], [0]
+    workers = [gevent.spawn(run_queries, engine, query, stop, counter) for _ in range(args.workers)]
+    gevent.sleep(0.5)  # laisse le pool s'ouvrir
+    counter[0] = 0
+    lags = probe(args.duration)
+    queries = counter[0]
+    stop[0] = True
+    gevent.joinall(workers)
+    report('sous charge', lags, queries, args.duration)
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
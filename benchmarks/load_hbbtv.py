@@ -0,0 +1,327 @@
+"""Charge simulée d'une audience HbbTV sur l'application réelle (create_app).
+
+Chaque client virtuel rejoue le parcours de `templates/hbbtv_index.html` :
+interrogation de /api/sessions/current (requête conditionnelle avec ETag),
+connexion Socket.IO + join_session, question pour une partie des clients,
+réponse au quiz via /session/<id>/quiz/<id>/respond, puis déconnexion.
+Un administrateur charge aussi /admin/dashboard, dont le nombre de requêtes
+doit rester constant.
+
+Les clients Socket.IO et HTTP sont les clients de test de Flask-SocketIO et
+de Flask : ils traversent les vrais gestionnaires, salles et émissions, sans
+réseau. La base est SQLite (fichier temporaire) et Redis est fakeredis, sauf
+si --redis-url désigne un vrai serveur.
+
+Rapport : p50/p99 par opération, événements par seconde et requêtes SQL par
+opération (celles des tâches de fond sont comptées à part). Les références sont
+dans benchmarks/baselines/load_hbbtv.json :
+
+    python benchmarks/load_hbbtv.py                    # compare à la référence
+    python benchmarks/load_hbbtv.py --save-baseline    # enregistre la référence
+
+Code de sortie 1 si une opération régresse : p99 au-delà de la tolérance, plus
+d'erreurs (acks « error » et statuts HTTP >= 400 compris) ou plus de requêtes
+SQL par opération.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import gevent
+from gevent.local import local
+from gevent.pool import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baselines', 'load_hbbtv.json')
+BACKGROUND = 'arrière-plan'
+
+
+def configure_environment(args, workdir):
+    """Prépare l'environnement avant l'import de l'application (Config lit os.environ)"""
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ['SECRET_KEY'] = 'benchmark'
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = ''
+    os.environ['TRANSCRIPT_ARCHIVE_DIR'] = os.path.join(workdir, 'transcripts')
+    for name in ('ADMIN_NAME', 'ADMIN_EMAIL', 'ADMIN_PASSWORD'):
+        os.environ.pop(name, None)
+    if args.redis_url:
+        url = urlparse(args.redis_url)
+        os.environ['REDIS_HOST'] = url.hostname or 'localhost'
+        os.environ['REDIS_PORT'] = str(url.port or 6379)
+        os.environ['REDIS_DB'] = (url.path or '/0').lstrip('/') or '0'
+    else:
+        os.environ['REDIS_HOST'] = 'localhost'
+    # Le limiteur de questions par session refuserait une partie des questions simulées :
+    # la charge mesure leur traitement, pas leur refus
+    os.environ['QUESTION_SESSION_RATE_PER_MIN'] = str(max(args.clients, 300) * 60)
+    os.environ['QUESTION_SESSION_BURST'] = str(max(args.clients, 50))
+    # Les journaux d'information fausseraient les mesures
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    sys.path.insert(0, ROOT)
+
+
+def use_fakeredis():
+    import fakeredis
+    import extensions
+    server = fakeredis.FakeServer()
+    extensions.ConnectionPool = lambda **kwargs: None
+    extensions.InstrumentedRedis = lambda connection_pool=None: fakeredis.FakeRedis(server=server)
+
+
+class Recorder:
+    """Latences et requêtes SQL par opération"""
+
+    def __init__(self):
+        self.current = local()
+        self.latencies = {}
+        self.queries = {}
+        self.errors = {}
+        self.outcomes = {}
+
+    def on_query(self, *args):
+        op = getattr(self.current, 'op', None) or BACKGROUND
+        self.queries[op] = self.queries.get(op, 0) + 1
+
+    def measure(self, op, func, *args, **kwargs):
+        self.current.op = op
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            self.errors[op] = self.errors.get(op, 0) + 1
+            raise
+        finally:
+            self.latencies.setdefault(op, []).append((time.perf_counter() - start) * 1000)
+            self.current.op = None
+
+    def outcome(self, op, status):
+        """Résultat d'une opération : un ack 'error' ou un statut HTTP >= 400 compte comme erreur"""
+        counts = self.outcomes.setdefault(op, {})
+        counts[status] = counts.get(status, 0) + 1
+        if status == 'error' or (isinstance(status, int) and status >= 400):
+            self.errors[op] = self.errors.get(op, 0) + 1
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def create_schema():
+    """Crée les tables avant create_app(), qui démarre aussitôt les tâches de fond (échéancier, flusher)"""
+    from sqlalchemy import create_engine
+    from extensions import db
+    import models  # noqa: F401  (déclare les tables dans db.metadata)
+    engine = create_engine(os.environ['SQLALCHEMY_DATABASE_URI'])
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+
+def seed(app, db):
+    from datetime import datetime, timedelta
+    from models import User, Session, Quiz
+    from services.tallies import init_tally
+    from services.streams import index_stream_key
+    from services.analytics import init_quiz_stats
+    from services.leaderboard import store_quiz_meta
+    from extensions import redis_pipeline
+    with app.app_context():
+        admin = User(username='admin', email='admin@bench', password_hash='x', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        session = Session(
+            title='Session de charge', description='', status='live', stream_key='session_bench',
+            start_time=datetime.utcnow() - timedelta(minutes=5),
+            end_time=datetime.utcnow() + timedelta(hours=2), user_id=admin.id
+        )
+        db.session.add(session)
+        db.session.commit()
+        quiz = Quiz(session_id=session.id, question='Quelle culture ?', options=['Maïs', 'Mil', 'Sorgho', 'Riz'],
+                    correct_answer=1, timestamp=datetime.now())
+        db.session.add(quiz)
+        init_quiz_stats(quiz)
+        db.session.commit()
+        with redis_pipeline() as pipe:
+            init_tally(quiz, pipe=pipe)
+            store_quiz_meta(quiz, pipe)
+        index_stream_key(session)
+        return admin.id, session.id, quiz.id
+
+
+def viewer(index, args, app, socketio, recorder, session_id, quiz_id):
+    """Un téléviseur : le parcours de hbbtv_index.html"""
+    http = app.test_client()
+    device_id = f'device_{index:06d}'
+    etag = None
+    for _ in range(args.polls):
+        headers = {'If-None-Match': etag} if etag else {}
+        response = recorder.measure('GET /api/sessions/current', http.get, '/api/sessions/current', headers=headers)
+        recorder.outcome('GET /api/sessions/current', response.status_code)
+        etag = response.headers.get('ETag', etag)
+        gevent.sleep(0)
+
+    client = recorder.measure('socket connect', socketio.test_client, app)
+    recorder.measure('join_session', client.emit, 'join_session', {'session_id': session_id, 'device_id': device_id})
+    client.get_received()
+
+    if index % args.question_every == 0:
+        ack = recorder.measure('question', client.emit, 'question', {
+            'session_id': session_id,
+            'question_text': f'Question {index} sur la fertilisation ?',
+            'device_id': device_id
+        }, callback=True)
+        recorder.outcome('question', (ack or {}).get('status', 'none'))
+
+    response = recorder.measure(
+        'POST /session/<id>/quiz/<id>/respond', http.post,
+        f'/session/{session_id}/quiz/{quiz_id}/respond',
+        json={'device_id': device_id, 'selected_option': index % 4}
+    )
+    recorder.outcome('POST /session/<id>/quiz/<id>/respond', response.status_code)
+    gevent.sleep(0)
+    recorder.measure('disconnect', client.disconnect)
+
+
+def admin_views(args, app, recorder, admin_id):
+    http = app.test_client()
+    with http.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+    for _ in range(args.admin_views):
+        response = recorder.measure('GET /admin/dashboard', http.get, '/admin/dashboard')
+        recorder.outcome('GET /admin/dashboard', response.status_code)
+        gevent.sleep(0.05)
+
+
+def build_report(args, recorder, elapsed):
+    operations = {}
+    for op, latencies in sorted(recorder.latencies.items()):
+        operations[op] = {
+            'count': len(latencies),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries_per_op': round(recorder.queries.get(op, 0) / len(latencies), 3),
+            'errors': recorder.errors.get(op, 0),
+            'outcomes': {str(k): v for k, v in sorted(recorder.outcomes.get(op, {}).items(), key=str)}
+        }
+    total = sum(len(latencies) for latencies in recorder.latencies.values())
+    return {
+        'parameters': {
+            'clients': args.clients, 'concurrency': args.concurrency, 'polls': args.polls,
+            'question_every': args.question_every, 'admin_views': args.admin_views
+        },
+        'events_per_second': round(total / elapsed, 1),
+        'background_queries': recorder.queries.get(BACKGROUND, 0),
+        'operations': operations
+    }
+
+
+def print_report(report):
+    print(f"\n{'opération':<40}{'n':>7}{'p50 ms':>10}{'p99 ms':>10}{'SQL/op':>9}{'err':>6}  résultats")
+    for op, stats in report['operations'].items():
+        print(f"{op:<40}{stats['count']:>7}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+              f"{stats['queries_per_op']:>9.2f}{stats['errors']:>6}  {stats['outcomes']}")
+    print(f"\névénements/s : {report['events_per_second']}  requêtes SQL en arrière-plan : {report['background_queries']}")
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Liste des régressions par rapport à la référence ; None si les paramètres diffèrent (pas de comparaison)"""
+    if report['parameters'] != baseline['parameters']:
+        return None
+    regressions = []
+    for op, reference in baseline['operations'].items():
+        current = report['operations'].get(op)
+        if current is None:
+            regressions.append(f"{op} : opération absente")
+            continue
+        if current['queries_per_op'] > reference['queries_per_op'] + 0.01:
+            regressions.append(f"{op} : {current['queries_per_op']} requêtes SQL/op (référence {reference['queries_per_op']})")
+        # Marge absolue en plus de la relative : sous la milliseconde, le p99 n'est que du bruit
+        if current['p99_ms'] > max(reference['p99_ms'] * (1 + tolerance), reference['p99_ms'] + min_delta_ms):
+            regressions.append(f"{op} : p99 {current['p99_ms']} ms (référence {reference['p99_ms']} ms)")
+        if current['errors'] > reference['errors']:
+            regressions.append(f"{op} : {current['errors']} erreurs (référence {reference['errors']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge simulée d'une audience HbbTV")
+    parser.add_argument('--clients', type=int, default=1000, help="téléviseurs simulés")
+    parser.add_argument('--concurrency', type=int, default=50, help="clients actifs simultanément")
+    parser.add_argument('--polls', type=int, default=3, help="interrogations de /api/sessions/current par client")
+    parser.add_argument('--question-every', type=int, default=10, help="un client sur N pose une question")
+    parser.add_argument('--admin-views', type=int, default=20, help="chargements du tableau de bord admin")
+    parser.add_argument('--redis-url', help="vrai Redis (ex. redis://localhost:6379/15) au lieu de fakeredis")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="marge tolérée sur le p99 (0.5 = +50 %%)")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="hausse minimale du p99 (ms) comptée comme régression")
+    parser.add_argument('--save-baseline', action='store_true', help="enregistre ce résultat comme référence")
+    parser.add_argument('--output', help="écrit aussi le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='agri-load-')
+    configure_environment(args, workdir)
+    if not args.redis_url:
+        use_fakeredis()
+
+    import app as app_module
+    from extensions import db, socketio
+    from sqlalchemy import event
+
+    create_schema()
+    app = app_module.create_app()
+    admin_id, session_id, quiz_id = seed(app, db)
+    recorder = Recorder()
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', recorder.on_query)
+
+    started = time.perf_counter()
+    admin = gevent.spawn(admin_views, args, app, recorder, admin_id)
+    pool = Pool(args.concurrency)
+    for index in range(args.clients):
+        pool.spawn(viewer, index, args, app, socketio, recorder, session_id, quiz_id)
+    pool.join()
+    admin.join()
+    elapsed = time.perf_counter() - started
+
+    app_module.stop_background_services(app)
+
+    report = build_report(args, recorder, elapsed)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2, ensure_ascii=False)
+            baseline_file.write('\n')
+        print(f"Référence enregistrée : {BASELINE_PATH}")
+        return 0
+
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance, args.min_delta_ms)
+        if regressions is None:
+            print("\nComparaison ignorée : paramètres différents de la référence")
+        elif regressions:
+            print("\nRégressions :")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        else:
+            print("\nAucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""Taille et coût de décodage des événements Socket.IO, JSON lisible contre compact.
+
+Pour des événements représentatifs d'une session (questions, quiz, résultats,
+classement, snapshot), mesure :
+- les octets de la trame Socket.IO (`42["événement",...]`) dans chaque encodage ;
+- le coût d'encodage côté serveur (les deux encodages sont produits à chaque émission) ;
+- le coût de décodage côté client : JSON.parse puis expandPayload(), le code
+  extrait de templates/hbbtv_index.html et exécuté par Node ; sans Node, la même
+  chose est mesurée en Python, à titre indicatif seulement.
+
+    python benchmarks/payloads.py
+    python benchmarks/payloads.py --questions 200 --iterations 5000
+
+Code de sortie 1 si le schéma de clés du client ne correspond pas à SHORT_KEYS.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(ROOT, 'templates', 'hbbtv_index.html')
+
+NODE_DECODER = """
+const events = JSON.parse(require('fs').readFileSync(0, 'utf-8'));
+const iterations = %(iterations)d;
+%(client)s
+const results = {};
+for (const [name, frames] of Object.entries(events)) {
+    results[name] = {};
+    for (const mode of ['verbose', 'compact']) {
+        const frame = frames[mode];
+        const decode = () => {
+            const packet = JSON.parse(frame.slice(2));
+            const payload = typeof packet[1] === 'string' ? JSON.parse(packet[1]) : packet[1];
+            return mode === 'compact' ? expandPayload(payload) : payload;
+        };
+        // Préchauffage du JIT avant la mesure
+        for (let i = 0; i < iterations; i++) {
+            decode();
+        }
+        const started = process.hrtime.bigint();
+        for (let i = 0; i < iterations; i++) {
+            decode();
+        }
+        results[name][mode] = Number(process.hrtime.bigint() - started) / iterations / 1000;
+    }
+}
+console.log(JSON.stringify(results));
+"""
+
+
+def sample_events(question_count):
+    """Événements tels que construits par les routes et les gestionnaires (dates non sérialisées)"""
+    now = datetime.now()
+    questions = [{
+        'question_id': 1000 + i,
+        'question_text': "Quelle est la meilleure période pour semer le mil dans le Sahel ?",
+        'answer_text': "Dès les premières pluies utiles, en général entre juin et juillet." if i % 2 else None,
+        'timestamp': now - timedelta(minutes=question_count - i)
+    } for i in range(question_count)]
+    quizzes = [{
+        'id': 200 + i,
+        'question': "Quelle culture résiste le mieux à la sécheresse ?",
+        'options': ['Maïs', 'Mil', 'Sorgho', 'Riz'],
+        'timestamp': now - timedelta(minutes=5 * i)
+    } for i in range(5)]
+    return {
+        'new_question': {'session_id': 12, **questions[0], 'answer_text': None},
+        'new_answer': {'session_id': 12, **questions[1]},
+        'new_quiz': {'session_id': 12, **quizzes[0]},
+        'quiz_tally': {'session_id': 12, 'quiz_id': 200, 'results': [412, 1893, 977, 58], 'total_responses': 3340},
+        'leaderboard_update': {'session_id': 12, 'top': [
+            {'rank': i + 1, 'player': f"{0xA1B2C3 + i * 7919:06X}", 'score': 1500 - i * 37} for i in range(10)
+        ]},
+        'session_status_changed': {'session_id': 12, 'status': 'ended'},
+        'session_snapshot': {'session_id': 12, 'questions': questions, 'quizzes': quizzes}
+    }
+
+
+def frame(event, payload):
+    """Trame Socket.IO telle qu'envoyée sur le websocket (python-socketio : séparateurs compacts)"""
+    return '42' + json.dumps([event, payload], separators=(',', ':'))
+
+
+def encode_frames(events):
+    from services.payloads import dumps, encode
+    frames = {}
+    for name, payload in events.items():
+        if name == 'session_snapshot':
+            # Le snapshot est émis pré-sérialisé depuis Redis
+            frames[name] = {'verbose': frame(name, dumps(payload)), 'compact': frame(name, dumps(payload, compact=True))}
+        else:
+            frames[name] = {'verbose': frame(name, encode(payload)), 'compact': frame(name, encode(payload, True))}
+    return frames
+
+
+def time_encoding(events, iterations):
+    from services.payloads import encode
+    timings = {}
+    for name, payload in events.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            encode(payload)
+            encode(payload, True)
+        timings[name] = (time.perf_counter() - started) / iterations * 1e6
+    return timings
+
+
+def client_code():
+    """LONG_KEYS et expandPayload() de la page HbbTV, tels que servis aux téléviseurs"""
+    with open(TEMPLATE_PATH, encoding='utf-8') as template:
+        source = template.read()
+    match = re.search(r"(const LONG_KEYS = \{.*?\};.*?function expandPayload\(value\) \{.*?\n        \})", source, re.S)
+    if match is None:
+        raise SystemExit("expandPayload() introuvable dans templates/hbbtv_index.html")
+    return match.group(1)
+
+
+def client_keys(code):
+    body = re.search(r"const LONG_KEYS = \{(.*?)\};", code, re.S).group(1)
+    return dict(re.findall(r"(\w+): '(\w+)'", body))
+
+
+def decode_with_node(frames, code, iterations):
+    script = NODE_DECODER % {'iterations': iterations, 'client': code}
+    result = subprocess.run(['node', '-e', script], input=json.dumps(frames), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def decode_with_python(frames, iterations):
+    from services.payloads import SHORT_KEYS
+    long_keys = {short: key for key, short in SHORT_KEYS.items()}
+
+    def expand(value):
+        if isinstance(value, list):
+            return [expand(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        expanded = {}
+        for key, item in value.items():
+            name = long_keys.get(key, key)
+            expanded[name] = item * 1000 if name == 'timestamp' else expand(item)
+        return expanded
+
+    results = {}
+    for name, modes in frames.items():
+        results[name] = {}
+        for mode, text in modes.items():
+            started = time.perf_counter()
+            for _ in range(iterations):
+                packet = json.loads(text[2:])
+                payload = json.loads(packet[1]) if isinstance(packet[1], str) else packet[1]
+                if mode == 'compact':
+                    expand(payload)
+            results[name][mode] = (time.perf_counter() - started) / iterations * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=50, help='Questions dans le snapshot')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    from services.payloads import SHORT_KEYS
+
+    code = client_code()
+    expected = {short: key for key, short in SHORT_KEYS.items()}
+    if client_keys(code) != expected:
+        print("Le schéma LONG_KEYS de templates/hbbtv_index.html ne correspond pas à SHORT_KEYS")
+        return 1
+
+    events = sample_events(args.questions)
+    frames = encode_frames(events)
+    encoding = time_encoding(events, args.iterations)
+    if shutil.which('node'):
+        decoding, decoder = decode_with_node(frames, code, args.iterations), 'Node'
+    else:
+        decoding, decoder = decode_with_python(frames, args.iterations), 'Python (indicatif, Node absent)'
+
+    print(f"\n{'événement':<24}{'octets JSON':>12}{'compact':>10}{'gain':>8}"
+          f"{'décodage µs':>14}{'compact':>10}{'encodage µs':>14}")
+    total_verbose = total_compact = 0
+    for name, modes in frames.items():
+        verbose, compact = len(modes['verbose'].encode('utf-8')), len(modes['compact'].encode('utf-8'))
+        total_verbose += verbose
+        total_compact += compact
+        print(f"{name:<24}{verbose:>12}{compact:>10}{1 - compact / verbose:>8.0%}"
+              f"{decoding[name]['verbose']:>14.2f}{decoding[name]['compact']:>10.2f}{encoding[name]:>14.2f}")
+    print(f"\ntotal : {total_verbose} -> {total_compact} octets ({1 - total_compact / total_verbose:.0%} de moins)")
+    print(f"décodage client mesuré avec {decoder} ; encodage = lisible + compact, par émission")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
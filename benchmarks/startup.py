@@ -0,0 +1,146 @@
+"""Temps de démarrage du conteneur web, jusqu'à la première requête servie.
+
+Chaque mesure est un processus neuf (démarrage à froid de l'interpréteur) qui
+importe l'application, appelle create_app puis sert /health-check. La
+préparation (`flask bootstrap` : migrations et administrateur) est mesurée à
+part sur une base vide, puis à nouveau sur une base déjà à jour, ce que paie
+chaque redémarrage. La base est SQLite et Redis est fakeredis.
+
+    python benchmarks/startup.py                    # compare à la référence
+    python benchmarks/startup.py --save-baseline    # enregistre la référence
+
+Code de sortie 1 si une phase dépasse la référence au-delà de la tolérance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baselines', 'startup.json')
+# Marge absolue : les phases de quelques millisecondes varient plus que la tolérance relative
+SLACK_MS = 25
+
+
+def configure_environment(workdir):
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    os.environ['SECRET_KEY'] = 'benchmark'
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = ''
+    os.environ['REDIS_HOST'] = 'localhost'
+    os.environ['TRANSCRIPT_ARCHIVE_DIR'] = os.path.join(workdir, 'transcripts')
+    os.environ['ADMIN_NAME'] = 'admin'
+    os.environ['ADMIN_EMAIL'] = 'admin@bench'
+    os.environ['ADMIN_PASSWORD'] = 'benchmark'
+
+
+def child(phase):
+    """Une mesure, dans un processus neuf ; écrit les durées (ms) en JSON sur la dernière ligne"""
+    started = time.perf_counter()
+    from gevent import monkey
+    monkey.patch_all()
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from load_hbbtv import use_fakeredis
+    use_fakeredis()
+    timings = {}
+
+    import app as app_module
+    timings['import_ms'] = (time.perf_counter() - started) * 1000
+
+    mark = time.perf_counter()
+    app = app_module.create_app()
+    timings['create_app_ms'] = (time.perf_counter() - mark) * 1000
+
+    if phase == 'bootstrap':
+        mark = time.perf_counter()
+        result = app.test_cli_runner().invoke(args=['bootstrap'])
+        if result.exit_code != 0:
+            raise SystemExit(result.output)
+        timings['bootstrap_ms'] = (time.perf_counter() - mark) * 1000
+    else:
+        mark = time.perf_counter()
+        response = app.test_client().get('/health-check')
+        timings['first_request_ms'] = (time.perf_counter() - mark) * 1000
+        if response.status_code != 200:
+            raise SystemExit(f"/health-check : {response.status_code}")
+    timings['total_ms'] = (time.perf_counter() - started) * 1000
+    print(json.dumps(timings))
+    # Les tâches de fond ne doivent pas retarder la fin du processus
+    os._exit(0)
+
+
+def measure(phase, extra_env=None):
+    env = dict(os.environ, **(extra_env or {}))
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', phase],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process_ms'] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def summarize(samples):
+    return {name: round(statistics.median(sample[name] for sample in samples), 1) for name in samples[0]}
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for phase, reference in baseline['phases'].items():
+        current = report['phases'].get(phase, {})
+        for name, value in reference.items():
+            if name in current and current[name] > value * (1 + tolerance) + SLACK_MS:
+                regressions.append(f"{phase}.{name} : {current[name]} ms (référence {value} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage jusqu'à la première requête")
+    parser.add_argument('--runs', type=int, default=5, help="démarrages mesurés (médiane)")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="marge tolérée (0.5 = +50 %%)")
+    parser.add_argument('--save-baseline', action='store_true', help="enregistre ce résultat comme référence")
+    parser.add_argument('--child', choices=['bootstrap', 'boot'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return 0
+
+    configure_environment(tempfile.mkdtemp(prefix='agri-startup-'))
+    cli = {'BACKGROUND_SERVICES': 'false'}
+    report = {'runs': args.runs, 'phases': {
+        'bootstrap_base_vide': summarize([measure('bootstrap', cli)]),
+        'bootstrap_base_a_jour': summarize([measure('bootstrap', cli) for _ in range(args.runs)]),
+        'demarrage_web': summarize([measure('boot') for _ in range(args.runs)])
+    }}
+
+    for phase, timings in report['phases'].items():
+        print(f"{phase:<24}" + '  '.join(f"{name} {value:>8.1f}" for name, value in timings.items()))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2, ensure_ascii=False)
+            baseline_file.write('\n')
+        print(f"Référence enregistrée : {BASELINE_PATH}")
+        return 0
+
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("\nRégressions :")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\nAucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,13 +3,89 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def _database_uri():
+    # mysqlclient (pilote C) bloque toute la boucle gevent pendant chaque requête ;
+    # PyMySQL, en pur Python, passe par les sockets patchés et cède la main aux autres greenlets
+    uri = os.getenv('SQLALCHEMY_DATABASE_URI')
+    if uri and uri.split('://', 1)[0] in ('mysql', 'mysql+mysqldb'):
+        uri = 'mysql+pymysql://' + uri.split('://', 1)[1]
+    return uri
+
+def _engine_options(uri):
+    if not uri or not uri.startswith('mysql'):
+        return {}
+    # Dimensionné pour la concurrence des greenlets : au-delà de pool_size + max_overflow,
+    # une requête attend au plus DB_POOL_TIMEOUT secondes une connexion libre
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 280)),
+        'pool_pre_ping': True
+    }
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
-    SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
+    SQLALCHEMY_DATABASE_URI = _database_uri()
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SRS_SERVER = os.getenv('SRS_SERVER', 'localhost')
     SRS_RTMP_PORT = int(os.getenv('SRS_RTMP_PORT', 1935))
     SRS_HTTP_PORT = int(os.getenv('SRS_HTTP_PORT', 8080))
+    SRS_HOOK_SECRET = os.getenv('SRS_HOOK_SECRET')
+    SRS_UNPUBLISH_GRACE = int(os.getenv('SRS_UNPUBLISH_GRACE', 30))
     REDIS_HOST = os.getenv('REDIS_HOST')
     REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
     REDIS_DB = int(os.getenv('REDIS_DB', 0))
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
+    # File de messages Socket.IO partagée entre workers ; vide = un seul processus (benchmarks, dev)
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', f'redis://{REDIS_HOST}:{REDIS_PORT}/0')
+    SNAPSHOT_TTL = int(os.getenv('SNAPSHOT_TTL', 86400))
+    RESPONSE_FLUSH_BATCH = int(os.getenv('RESPONSE_FLUSH_BATCH', 500))
+    RESPONSE_FLUSH_INTERVAL_MS = int(os.getenv('RESPONSE_FLUSH_INTERVAL_MS', 1000))
+    RESPONSE_CLAIM_IDLE_MS = int(os.getenv('RESPONSE_CLAIM_IDLE_MS', 60000))
+    TALLY_TTL = int(os.getenv('TALLY_TTL', 7 * 86400))
+    TALLY_RECONCILE_MINUTES = int(os.getenv('TALLY_RECONCILE_MINUTES', 5))
+    TALLY_BROADCAST_WINDOW_MS = int(os.getenv('TALLY_BROADCAST_WINDOW_MS', 250))
+    CURRENT_SESSION_TTL = int(os.getenv('CURRENT_SESSION_TTL', 3600))
+    ANSWER_GUARD_TTL = int(os.getenv('ANSWER_GUARD_TTL', 48 * 3600))
+    SESSION_EXPIRY_MAX_SLEEP = int(os.getenv('SESSION_EXPIRY_MAX_SLEEP', 30))
+    QUESTION_CLIENT_RATE_PER_MIN = int(os.getenv('QUESTION_CLIENT_RATE_PER_MIN', 6))
+    QUESTION_CLIENT_BURST = int(os.getenv('QUESTION_CLIENT_BURST', 3))
+    QUESTION_SESSION_RATE_PER_MIN = int(os.getenv('QUESTION_SESSION_RATE_PER_MIN', 300))
+    QUESTION_SESSION_BURST = int(os.getenv('QUESTION_SESSION_BURST', 50))
+    TRANSCRIPT_MAX_QUESTIONS = int(os.getenv('TRANSCRIPT_MAX_QUESTIONS', 1000))
+    TRANSCRIPT_MAX_QUIZ_RESPONSES = int(os.getenv('TRANSCRIPT_MAX_QUIZ_RESPONSES', 5000))
+    TRANSCRIPT_TTL = int(os.getenv('TRANSCRIPT_TTL', 7 * 86400))
+    TRANSCRIPT_RETENTION_AFTER_END = int(os.getenv('TRANSCRIPT_RETENTION_AFTER_END', 3600))
+    # Hors de media/, que SRS sert publiquement : les archives ne sont lues que par l'application
+    TRANSCRIPT_ARCHIVE_DIR = os.getenv('TRANSCRIPT_ARCHIVE_DIR', 'instance/transcripts')
+    LEADERBOARD_POINTS = int(os.getenv('LEADERBOARD_POINTS', 100))
+    LEADERBOARD_SPEED_BONUS = int(os.getenv('LEADERBOARD_SPEED_BONUS', 50))
+    LEADERBOARD_SPEED_WINDOW = int(os.getenv('LEADERBOARD_SPEED_WINDOW', 30))
+    LEADERBOARD_TOP_N = int(os.getenv('LEADERBOARD_TOP_N', 10))
+    LEADERBOARD_TTL = int(os.getenv('LEADERBOARD_TTL', 7 * 86400))
+    LEADERBOARD_RETENTION_AFTER_END = int(os.getenv('LEADERBOARD_RETENTION_AFTER_END', 3600))
+    SOCKET_WORKERS = int(os.getenv('SOCKET_WORKERS', 20))
+    SOCKET_QUEUE_LIMIT = int(os.getenv('SOCKET_QUEUE_LIMIT', 1000))
+    PRESENCE_HEARTBEAT = int(os.getenv('PRESENCE_HEARTBEAT', 30))
+    PRESENCE_KEY_TTL = int(os.getenv('PRESENCE_KEY_TTL', 86400))
+    PRESENCE_DEVICES_TTL = int(os.getenv('PRESENCE_DEVICES_TTL', 30 * 86400))
+    # Durée de cache des fichiers statiques empreintés (services/assets.py) : un an
+    ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE', 365 * 86400))
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 25))
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+    PROFILE_PYTHON = os.getenv('PROFILE_PYTHON', 'true').lower() == 'true'
+    PROFILE_N_PLUS_ONE = int(os.getenv('PROFILE_N_PLUS_ONE', 5))
+    PROFILE_MAX_TRACES = int(os.getenv('PROFILE_MAX_TRACES', 200))
+    BACKGROUND_SERVICES = os.getenv('BACKGROUND_SERVICES', 'true').lower() == 'true'
+    # /metrics : jeton Bearer et/ou adresses autorisées (IP ou réseaux CIDR, séparés par des virgules)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', 'engineio=WARNING,socketio=WARNING,geventwebsocket=WARNING,apscheduler=WARNING,alembic=WARNING')
+    LOG_SAMPLING = os.getenv('LOG_SAMPLING', 'sockets.connections=0.01,engineio=0.01,socketio=0.01')
+    LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', 20))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
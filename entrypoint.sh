@@ -1,68 +1,39 @@
 #!/bin/bash
 set -e
 
-echo "Step 0: Initial delay for services initialization..."
-sleep 15
-
-# Fonction améliorée avec timeout et vérification active
-wait_for_service() {
-    local host=$1
-    local port=$2
-    local service=$3
-    local max_retries=30
-    local retries=0
-    
-    echo "Step 1: Waiting for $service ($host:$port)..."
-    until nc -z -w 1 $host $port; do
-        retries=$((retries+1))
-        if [ $retries -ge $max_retries ]; then
-            echo "Error: $service not available after $max_retries attempts"
+# Délai maximal d'attente des services (secondes) et intervalle de sondage
+WAIT_TIMEOUT=${WAIT_TIMEOUT:-60}
+WAIT_INTERVAL=${WAIT_INTERVAL:-0.5}
+
+# Attend qu'une commande réussisse, sans délai fixe : on démarre dès que le service répond
+wait_until() {
+    local service=$1
+    shift
+    local deadline=$((SECONDS + WAIT_TIMEOUT))
+    until "$@" > /dev/null 2>&1; do
+        if [ $SECONDS -ge $deadline ]; then
+            echo "Error: $service not available after ${WAIT_TIMEOUT}s"
             exit 1
         fi
-        sleep 2
+        sleep $WAIT_INTERVAL
     done
-    echo "$service is ready!"
+    echo "$service is ready! (${SECONDS}s)"
 }
 
-# Attente des services
-wait_for_service db 3306 "MySQL"
-wait_for_service redis 6379 "Redis"
-wait_for_service srs 1985 "SRS"
-
-# Vérification MySQL avec credentials
-echo "Step 2: Verifying MySQL database access..."
-while ! mysql -h db -u admin -p"${MYSQL_PASSWORD}" -e "USE agri_assist; SELECT 1;"; do
-    echo "MySQL access failed, retrying..."
-    sleep 2
-done
-echo "MySQL access confirmed!"
+# FAST_START=true : réplica supplémentaire, la base est déjà préparée par `flask bootstrap`
+if [ "${FAST_START:-false}" != "true" ]; then
+    echo "Step 1: Waiting for services..."
+    wait_until "MySQL" mysql -h db -u admin -p"${MYSQL_PASSWORD}" -e "USE agri_assist; SELECT 1;"
+    wait_until "Redis" nc -z -w 1 redis 6379
 
-# Initialisation complète de la base de données
-echo "Step 3: Initializing database migrations..."
-if [ ! -d "migrations" ]; then
-    echo "Creating new migrations repository..."
-    flask db init
+    # Migrations livrées dans migrations/ : le démarrage ne fait qu'appliquer celles qui manquent
+    echo "Step 2: Applying database migrations and default admin..."
+    BACKGROUND_SERVICES=false flask bootstrap
 fi
 
-echo "Generating database migrations..."
-flask db migrate -m "Initial deployment"
-
-echo "Applying database migrations..."
-for i in {1..3}; do
-    flask db upgrade && break || {
-        echo "Migration attempt $i failed"
-        [ $i -eq 3 ] && exit 1
-        sleep 5
-    }
-done
-echo "Database migrations applied successfully!"
-
-# Préparation des répertoires
-echo "Step 4: Preparing media directories..."
+echo "Step 3: Preparing media directories..."
 mkdir -p media/live media/vod
-chmod -R 755 media
-echo "Media directories prepared!"
+chmod 755 media media/live media/vod
 
-# Vérification finale
-echo "Step 5: Starting application..."
-exec "$@"
\ No newline at end of file
+echo "Step 4: Starting application (${SECONDS}s)..."
+exec "$@"
@@ -3,8 +3,15 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_socketio import SocketIO
 from flask_restx import Api
-from redis import Redis
-from flask import Blueprint
+from redis import Redis, ConnectionPool
+from redis.client import Pipeline
+from flask import Blueprint, current_app, has_app_context
+from contextlib import contextmanager
+import logging
+import time
+from services.metrics import REDIS_ROUNDTRIPS, REDIS_ROUNDTRIP_SECONDS
+
+logger = logging.getLogger(__name__)
 
 # Initialisation des extensions
 db = SQLAlchemy()
@@ -25,19 +32,76 @@ api = Api(
     default_label='API endpoints'
 )
 
+class InstrumentedPipeline(Pipeline):
+    # Un pipeline = un seul aller-retour, quel que soit le nombre de commandes
+    def execute(self, raise_on_error=True):
+        if not self.command_stack:
+            return super().execute(raise_on_error=raise_on_error)
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error=raise_on_error)
+        finally:
+            REDIS_ROUNDTRIPS.labels(command='PIPELINE').inc()
+            REDIS_ROUNDTRIP_SECONDS.labels(kind='pipeline').observe(time.perf_counter() - start)
+
+class InstrumentedRedis(Redis):
+    """Client Redis qui compte et chronomètre ses allers-retours"""
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_ROUNDTRIPS.labels(command=str(args[0]).upper()).inc()
+            REDIS_ROUNDTRIP_SECONDS.labels(kind='command').observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
 def init_redis(app):
+    """Crée le client Redis partagé sur un pool de connexions et l'enregistre sur l'application"""
     global redis_client
     try:
-        redis_client = Redis(
+        pool = ConnectionPool(
             host=app.config['REDIS_HOST'],
             port=app.config['REDIS_PORT'],
             db=app.config['REDIS_DB'],
-            socket_connect_timeout=5  # Timeout de connexion
+            max_connections=app.config['REDIS_MAX_CONNECTIONS'],
+            socket_connect_timeout=5,  # Timeout de connexion
+            socket_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+            health_check_interval=30
         )
+        client = InstrumentedRedis(connection_pool=pool)
         # Test la connexion
-        redis_client.ping()
-        print("Connexion Redis établie avec succès")
-        return redis_client
+        client.ping()
+        redis_client = client
+        app.extensions['redis'] = client
+        logger.info("Connexion Redis établie avec succès")
+        return client
+    except Exception as e:
+        logger.error(f"Erreur de connexion Redis: {str(e)}")
+        app.extensions['redis'] = None
+        return None
+
+def get_redis():
+    """Client Redis partagé (None si Redis est indisponible).
+    Lu à l'appel : un `from extensions import redis_client` fige la valeur None d'avant init_redis."""
+    if has_app_context():
+        return current_app.extensions.get('redis', redis_client)
+    return redis_client
+
+@contextmanager
+def redis_pipeline():
+    """Regroupe plusieurs écritures Redis en un seul aller-retour (MULTI/EXEC).
+    Fournit None si Redis est indisponible ; une erreur Redis est journalisée sans
+    interrompre l'appelant, la base restant la source de vérité."""
+    client = get_redis()
+    if client is None:
+        yield None
+        return
+    pipe = client.pipeline()
+    yield pipe
+    try:
+        pipe.execute()
     except Exception as e:
-        print(f"Erreur de connexion Redis: {str(e)}")
-        return None
\ No newline at end of file
+        logger.error(f"Erreur lors de l'exécution du pipeline Redis: {str(e)}")
@@ -0,0 +1,19 @@
+"""Configuration gunicorn, chargée automatiquement depuis le répertoire de l'application.
+
+Le worker gevent vide ses files (tâches Socket.IO, stream des réponses aux
+quiz) dans worker_exit, après l'arrêt gracieux des connexions et tant que la
+boucle gevent tourne : un atexit s'exécuterait pendant la destruction de
+l'interpréteur, où les sleeps gevent ne sont plus fiables.
+"""
+import os
+
+# Délai laissé au worker entre SIGTERM et SIGKILL, vidage des files compris
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+
+def worker_exit(server, worker):
+    from app import stop_background_services
+    try:
+        stop_background_services(worker.wsgi)
+    except Exception as e:
+        server.log.error(f"Erreur lors de l'arrêt des tâches de fond: {str(e)}")
@@ -0,0 +1,67 @@
+"""quiz response unique constraint and keyset indexes
+
+Dédoublonne quiz_response (la plus ancienne réponse d'un appareil à un quiz
+est gardée) puis crée l'index unique (quiz_id, device_id) et les index
+(session_id, timestamp, id) de la pagination par curseur. Les objets déjà
+présents (bases créées par create_all entre-temps) ne sont pas recréés.
+
+Revision ID: 0002_quiz_response_integrity
+Revises: 0001_initial
+Create Date: 2026-10-19 09:12:04.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_quiz_response_integrity'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+UNIQUE_NAME = 'uq_quiz_response_quiz_device'
+INDEXES = (
+    ('question', 'ix_question_session_timestamp'),
+    ('quiz', 'ix_quiz_session_timestamp'),
+)
+
+
+def _existing(inspector, table):
+    names = {index['name'] for index in inspector.get_indexes(table)}
+    names.update(constraint['name'] for constraint in inspector.get_unique_constraints(table))
+    return names
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if UNIQUE_NAME not in _existing(inspector, 'quiz_response'):
+        # Table dérivée : MySQL refuse une sous-requête sur la table du DELETE
+        op.execute("""
+            DELETE FROM quiz_response
+            WHERE device_id IS NOT NULL AND id NOT IN (
+                SELECT keep_id FROM (
+                    SELECT MIN(id) AS keep_id FROM quiz_response
+                    WHERE device_id IS NOT NULL
+                    GROUP BY quiz_id, device_id
+                ) AS kept
+            )
+        """)
+        with op.batch_alter_table('quiz_response', schema=None) as batch_op:
+            batch_op.create_unique_constraint(UNIQUE_NAME, ['quiz_id', 'device_id'])
+
+    for table, name in INDEXES:
+        if name not in _existing(inspector, table):
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.create_index(name, ['session_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    for table, name in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
+
+    with op.batch_alter_table('quiz_response', schema=None) as batch_op:
+        batch_op.drop_constraint(UNIQUE_NAME, type_='unique')
@@ -0,0 +1,125 @@
+"""quiz and session stats
+
+Revision ID: 0003_quiz_session_stats
+Revises: 0002_quiz_response_integrity
+Create Date: 2026-10-18 19:05:12.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_quiz_session_stats'
+down_revision = '0002_quiz_response_integrity'
+branch_labels = None
+depends_on = None
+
+# Copie figée de services.analytics.RESPONSE_TIME_BUCKETS au moment de la migration
+RESPONSE_TIME_BUCKETS = (5, 10, 20, 30, 60, 120, 300)
+
+
+def _bucket(seconds):
+    for index, bound in enumerate(RESPONSE_TIME_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(RESPONSE_TIME_BUCKETS)
+
+
+def upgrade():
+    quiz_stats = op.create_table('quiz_stats',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('total_responses', sa.Integer(), nullable=False),
+    sa.Column('correct_responses', sa.Integer(), nullable=False),
+    sa.Column('option_counts', sa.JSON(), nullable=False),
+    sa.Column('response_time_buckets', sa.JSON(), nullable=False),
+    sa.Column('response_time_sum_ms', sa.BigInteger(), nullable=False),
+    sa.Column('first_response_at', sa.DateTime(), nullable=True),
+    sa.Column('last_response_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.ForeignKeyConstraint(['session_id'], ['session.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id')
+    )
+    with op.batch_alter_table('quiz_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_stats_session_id'), ['session_id'], unique=False)
+
+    session_stats = op.create_table('session_stats',
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('answered_quizzes', sa.Integer(), nullable=False),
+    sa.Column('total_responses', sa.Integer(), nullable=False),
+    sa.Column('correct_responses', sa.Integer(), nullable=False),
+    sa.Column('response_time_sum_ms', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['session_id'], ['session.id'], ),
+    sa.PrimaryKeyConstraint('session_id')
+    )
+
+    # Statistiques des quiz existants, calculées une fois depuis les réponses
+    bind = op.get_bind()
+    quiz = sa.table('quiz', sa.column('id'), sa.column('session_id'), sa.column('options', sa.JSON),
+                    sa.column('correct_answer'), sa.column('timestamp', sa.DateTime))
+    response = sa.table('quiz_response', sa.column('quiz_id'), sa.column('selected_option'),
+                        sa.column('timestamp', sa.DateTime))
+
+    stats = {}
+    for quiz_id, session_id, options, correct_answer, published_at in bind.execute(sa.select(
+        quiz.c.id, quiz.c.session_id, quiz.c.options, quiz.c.correct_answer, quiz.c.timestamp
+    )):
+        stats[quiz_id] = {
+            'quiz_id': quiz_id,
+            'session_id': session_id,
+            'total_responses': 0,
+            'correct_responses': 0,
+            'option_counts': [0] * len(options),
+            'response_time_buckets': [0] * (len(RESPONSE_TIME_BUCKETS) + 1),
+            'response_time_sum_ms': 0,
+            'first_response_at': None,
+            'last_response_at': None,
+            '_correct_answer': correct_answer,
+            '_published_at': published_at
+        }
+    for quiz_id, selected_option, answered_at in bind.execute(sa.select(
+        response.c.quiz_id, response.c.selected_option, response.c.timestamp
+    )):
+        entry = stats.get(quiz_id)
+        if entry is None:
+            continue
+        elapsed_ms = max(0, int((answered_at - entry['_published_at']).total_seconds() * 1000))
+        if 0 <= selected_option < len(entry['option_counts']):
+            entry['option_counts'][selected_option] += 1
+        entry['response_time_buckets'][_bucket(elapsed_ms / 1000.0)] += 1
+        entry['total_responses'] += 1
+        entry['correct_responses'] += int(selected_option == entry['_correct_answer'])
+        entry['response_time_sum_ms'] += elapsed_ms
+        if entry['first_response_at'] is None or answered_at < entry['first_response_at']:
+            entry['first_response_at'] = answered_at
+        if entry['last_response_at'] is None or answered_at > entry['last_response_at']:
+            entry['last_response_at'] = answered_at
+
+    sessions = {}
+    for entry in stats.values():
+        totals = sessions.setdefault(entry['session_id'], {
+            'session_id': entry['session_id'],
+            'answered_quizzes': 0,
+            'total_responses': 0,
+            'correct_responses': 0,
+            'response_time_sum_ms': 0
+        })
+        totals['answered_quizzes'] += 1 if entry['total_responses'] else 0
+        totals['total_responses'] += entry['total_responses']
+        totals['correct_responses'] += entry['correct_responses']
+        totals['response_time_sum_ms'] += entry['response_time_sum_ms']
+
+    if stats:
+        op.bulk_insert(quiz_stats, [{key: value for key, value in entry.items() if not key.startswith('_')}
+                                    for entry in stats.values()])
+    if sessions:
+        op.bulk_insert(session_stats, list(sessions.values()))
+
+
+def downgrade():
+    op.drop_table('session_stats')
+    with op.batch_alter_table('quiz_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_stats_session_id'))
+
+    op.drop_table('quiz_stats')
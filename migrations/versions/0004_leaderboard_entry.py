@@ -0,0 +1,38 @@
+"""leaderboard entries
+
+Revision ID: 0004_leaderboard_entry
+Revises: 0003_quiz_session_stats
+Create Date: 2026-10-18 20:41:37.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_leaderboard_entry'
+down_revision = '0003_quiz_session_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('leaderboard_entry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.String(length=50), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['session_id'], ['session.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('session_id', 'device_id', name='uq_leaderboard_entry_session_device')
+    )
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.create_index('ix_leaderboard_entry_session_rank', ['session_id', 'rank'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.drop_index('ix_leaderboard_entry_session_rank')
+
+    op.drop_table('leaderboard_entry')
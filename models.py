@@ -23,6 +23,8 @@ class Session(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     questions = db.relationship('Question', backref='session', cascade='all, delete-orphan', lazy=True)
     quizzes = db.relationship('Quiz', backref='session', cascade='all, delete-orphan', lazy=True)
+    stats = db.relationship('SessionStats', backref='session', cascade='all, delete-orphan', uselist=False, lazy=True)
+    leaderboard = db.relationship('LeaderboardEntry', backref='session', cascade='all, delete-orphan', lazy=True)
     
     @property
     def is_active(self):
@@ -31,6 +33,10 @@ class Session(db.Model):
         return self.status == 'live' and self.start_time <= now <= self.end_time
 
 class Question(db.Model):
+    __table_args__ = (
+        db.Index('ix_question_session_timestamp', 'session_id', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False)
     question_text = db.Column(db.Text, nullable=False)
@@ -38,6 +44,10 @@ class Question(db.Model):
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class Quiz(db.Model):
+    __table_args__ = (
+        db.Index('ix_quiz_session_timestamp', 'session_id', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False)
     question = db.Column(db.Text, nullable=False)
@@ -45,6 +55,7 @@ class Quiz(db.Model):
     correct_answer = db.Column(db.Integer, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     responses = db.relationship('QuizResponse', backref='quiz', cascade='all, delete-orphan', lazy=True)
+    stats = db.relationship('QuizStats', backref='quiz', cascade='all, delete-orphan', uselist=False, lazy=True)
 
     @validates('session_id')
     def validate_session_id(self, key, session_id):
@@ -53,9 +64,46 @@ class Quiz(db.Model):
         return session_id
 
 class QuizResponse(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('quiz_id', 'device_id', name='uq_quiz_response_quiz_device'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     device_id = db.Column(db.String(50), nullable=True)
     selected_option = db.Column(db.Integer, nullable=False)
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class QuizStats(db.Model):
+    """Agrégats d'un quiz, tenus à jour à l'insertion des réponses (services/analytics.py)"""
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False, index=True)
+    total_responses = db.Column(db.Integer, nullable=False, default=0)
+    correct_responses = db.Column(db.Integer, nullable=False, default=0)
+    option_counts = db.Column(db.JSON, nullable=False)
+    response_time_buckets = db.Column(db.JSON, nullable=False)
+    response_time_sum_ms = db.Column(db.BigInteger, nullable=False, default=0)
+    first_response_at = db.Column(db.DateTime)
+    last_response_at = db.Column(db.DateTime)
+
+class SessionStats(db.Model):
+    """Totaux d'une session, incrémentés avec ceux de ses quiz"""
+    session_id = db.Column(db.Integer, db.ForeignKey('session.id'), primary_key=True)
+    answered_quizzes = db.Column(db.Integer, nullable=False, default=0)
+    total_responses = db.Column(db.Integer, nullable=False, default=0)
+    correct_responses = db.Column(db.Integer, nullable=False, default=0)
+    response_time_sum_ms = db.Column(db.BigInteger, nullable=False, default=0)
+
+class LeaderboardEntry(db.Model):
+    """Classement final d'une session, copié depuis Redis à sa fin (services/leaderboard.py)"""
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'device_id', name='uq_leaderboard_entry_session_device'),
+        db.Index('ix_leaderboard_entry_session_rank', 'session_id', 'rank'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False)
+    device_id = db.Column(db.String(50), nullable=False)
+    score = db.Column(db.Integer, nullable=False, default=0)
+    rank = db.Column(db.Integer, nullable=False)
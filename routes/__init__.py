@@ -2,4 +2,5 @@ from .auth import auth_bp
 from .admin import admin_bp
 from .sessions import sessions_bp
 from .quizzes import quizzes_bp
-from .main import main_bp
\ No newline at end of file
+from .main import main_bp
+from .srs_hooks import srs_hooks_bp
\ No newline at end of file
@@ -1,11 +1,28 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash  # <-- Import manquant
 from extensions import db
-from models import User, Session
+from models import User, Session, Question, Quiz, QuizResponse
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from services.presence import get_presence
+from services.profiling import list_traces, get_trace
 
 admin_bp = Blueprint('admin', __name__)
 
+USER_SORTS = {
+    'id': User.id,
+    'username': User.username,
+    'role': User.role
+}
+SESSION_SORTS = {
+    'id': Session.id,
+    'title': Session.title,
+    'start_time': Session.start_time,
+    'end_time': Session.end_time,
+    'status': Session.status
+}
+
 @admin_bp.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
@@ -13,9 +30,66 @@ def admin_dashboard():
         flash('Accès non autorisé', 'danger')
         return redirect(url_for('main.dashboard'))
     
-    users = User.query.all()
-    sessions = Session.query.all()
-    return render_template('admin_dashboard.html', users=users, sessions=sessions)
+    per_page = current_app.config['ADMIN_PAGE_SIZE']
+    users_sort = request.args.get('users_sort', 'id')
+    users_dir = 'desc' if request.args.get('users_dir') == 'desc' else 'asc'
+    sessions_sort = request.args.get('sort', 'start_time')
+    sessions_dir = 'asc' if request.args.get('dir') == 'asc' else 'desc'
+
+    # Utilisateurs de la page, puis leur nombre de sessions en une requête groupée
+    users = db.paginate(
+        db.select(User).order_by(_ordering(USER_SORTS.get(users_sort, User.id), users_dir), User.id),
+        page=request.args.get('users_page', 1, type=int), per_page=per_page, error_out=False
+    )
+    user_ids = [user.id for user in users.items]
+    session_counts = dict(
+        db.session.query(Session.user_id, func.count(Session.id))
+        .filter(Session.user_id.in_(user_ids)).group_by(Session.user_id).all()
+    ) if user_ids else {}
+
+    # Sessions de la page avec leur expert chargé en jointure, puis les compteurs en trois requêtes groupées
+    sessions = db.paginate(
+        db.select(Session).options(joinedload(Session.user))
+        .order_by(_ordering(SESSION_SORTS.get(sessions_sort, Session.start_time), sessions_dir), Session.id.desc()),
+        page=request.args.get('sessions_page', 1, type=int), per_page=per_page, error_out=False
+    )
+    counts = _session_counts([session.id for session in sessions.items])
+    presence = get_presence([session.id for session in sessions.items])
+
+    return render_template(
+        'admin_dashboard.html',
+        users=users,
+        session_counts=session_counts,
+        sessions=sessions,
+        counts=counts,
+        presence=presence,
+        users_sort=users_sort,
+        users_dir=users_dir,
+        sessions_sort=sessions_sort,
+        sessions_dir=sessions_dir
+    )
+
+def _ordering(column, direction):
+    return column.desc() if direction == 'desc' else column.asc()
+
+def _session_counts(session_ids):
+    """Nombre de questions, quiz et réponses par session pour une page de sessions"""
+    counts = {session_id: {'questions': 0, 'quizzes': 0, 'responses': 0} for session_id in session_ids}
+    if not session_ids:
+        return counts
+    aggregates = {
+        'questions': db.session.query(Question.session_id, func.count(Question.id))
+            .filter(Question.session_id.in_(session_ids)).group_by(Question.session_id),
+        'quizzes': db.session.query(Quiz.session_id, func.count(Quiz.id))
+            .filter(Quiz.session_id.in_(session_ids)).group_by(Quiz.session_id),
+        'responses': db.session.query(Quiz.session_id, func.count(QuizResponse.id))
+            .join(QuizResponse, QuizResponse.quiz_id == Quiz.id)
+            .filter(Quiz.session_id.in_(session_ids)).group_by(Quiz.session_id)
+    }
+    for name, query in aggregates.items():
+        for session_id, count in query.all():
+            counts[session_id][name] = count
+    return counts
 
 @admin_bp.route('/admin/user/create', methods=['GET', 'POST'])
 @login_required
@@ -86,4 +160,28 @@ def admin_delete_user(user_id):
     db.session.delete(user)
     db.session.commit()
     flash('Utilisateur supprimé avec succès', 'success')
-    return redirect(url_for('admin.admin_dashboard'))
\ No newline at end of file
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin_bp.route('/admin/traces')
+@login_required
+def admin_traces():
+    if current_user.role != 'admin':
+        flash('Accès non autorisé', 'danger')
+        return redirect(url_for('main.dashboard'))
+
+    traces = list_traces()
+    if request.args.get('n_plus_one') == '1':
+        traces = [trace for trace in traces if trace['n_plus_one']]
+    return render_template('admin_traces.html', traces=traces)
+
+@admin_bp.route('/admin/traces/<trace_id>')
+@login_required
+def admin_trace(trace_id):
+    if current_user.role != 'admin':
+        flash('Accès non autorisé', 'danger')
+        return redirect(url_for('main.dashboard'))
+
+    trace = get_trace(trace_id)
+    if trace is None:
+        abort(404)
+    return render_template('admin_trace.html', trace=trace)
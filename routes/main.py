@@ -1,9 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, send_from_directory, current_app
+from flask import Blueprint, render_template, redirect, url_for, send_from_directory, current_app, Response, jsonify, request, abort
 from flask_login import login_required, current_user
 from models import Session
+from extensions import db, get_redis
+from sqlalchemy import text
+import hmac
+import ipaddress
+import logging
 import os
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 main_bp = Blueprint('main', __name__)
+logger = logging.getLogger(__name__)
 
 @main_bp.route('/hbbtv')
 def hbbtv():
@@ -11,8 +18,54 @@ def hbbtv():
 
 @main_bp.route('/favicon.ico')
 def favicon():
+    # URL fixe demandée d'office par les navigateurs : cache d'un jour, pas d'empreinte possible
     return send_from_directory(os.path.join(current_app.root_path, 'static/images'),
-                               'favicon.ico', mimetype='image/vnd.microsoft.icon')
+                               'favicon.ico', mimetype='image/vnd.microsoft.icon', max_age=86400)
+
+def _metrics_allowed():
+    # Jeton Bearer (scrape Prometheus depuis un autre conteneur) ou adresse de la liste autorisée
+    token = current_app.config['METRICS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    for network in current_app.config['METRICS_ALLOWED_IPS'].split(','):
+        try:
+            if network.strip() and address in ipaddress.ip_network(network.strip(), strict=False):
+                return True
+        except ValueError:
+            logger.error(f"Erreur dans METRICS_ALLOWED_IPS : adresse invalide {network.strip()}")
+    return False
+
+@main_bp.route('/metrics')
+def metrics():
+    # Non publique : 404 plutôt que 403 pour ne pas signaler l'endpoint
+    if not _metrics_allowed():
+        abort(404)
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+@main_bp.route('/health-check')
+def health_check():
+    # Vérification légère : un SELECT 1 et un PING. Sans Redis l'application fonctionne
+    # en mode dégradé (replis SQL) : seul l'échec de la base rend le conteneur unhealthy.
+    checks = {}
+    try:
+        db.session.execute(text('SELECT 1'))
+        checks['database'] = 'ok'
+    except Exception as e:
+        logger.error(f"Health-check : base de données indisponible: {str(e)}")
+        checks['database'] = 'error'
+    redis_client = get_redis()
+    try:
+        checks['redis'] = 'ok' if redis_client and redis_client.ping() else 'unavailable'
+    except Exception as e:
+        logger.error(f"Health-check : Redis indisponible: {str(e)}")
+        checks['redis'] = 'error'
+    healthy = checks['database'] == 'ok'
+    status = 'ok' if healthy and checks['redis'] == 'ok' else ('degraded' if healthy else 'error')
+    return jsonify({'status': status, **checks}), 200 if healthy else 503
 
 @main_bp.route('/', methods=['GET'])
 def home():
@@ -1,12 +1,17 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from extensions import db, socketio, redis_client
+from extensions import db, redis_pipeline
 from models import Session, Quiz, QuizResponse
 from datetime import datetime
 import json
 import logging
-from flask import current_app
-from sqlalchemy import func
+from services.snapshot import invalidate_snapshot
+from services.responses import submit_response
+from services.tallies import init_tally, delete_tally
+from services.analytics import init_quiz_stats, quiz_results as build_quiz_results
+from services.broadcast import record_answer
+from services.leaderboard import store_quiz_meta, delete_quiz_meta, get_position
+from services.payloads import emit_to_session
 
 quizzes_bp = Blueprint('quizzes', __name__)
 logger = logging.getLogger(__name__)
@@ -42,22 +47,27 @@ def create_quiz(session_id):
             timestamp=datetime.now()
         )
         db.session.add(quiz)
+        init_quiz_stats(quiz)
         db.session.commit()
+        # Snapshot, compteurs et publication en un seul aller-retour Redis
+        with redis_pipeline() as pipe:
+            invalidate_snapshot(session_id, pipe=pipe)
+            init_tally(quiz, pipe=pipe)
+            store_quiz_meta(quiz, pipe)
+            if pipe is not None:
+                pipe.publish(f"session:{session_id}:quizzes", json.dumps({
+                    'id': quiz.id,
+                    'question': question,
+                    'options': options
+                }))
         
-        if hasattr(current_app, 'redis_client') and current_app.redis_client:
-            current_app.redis_client.publish(f"session:{session_id}:quizzes", json.dumps({
-                'id': quiz.id,
-                'question': question,
-                'options': options
-            }))
-        
-        socketio.emit('new_quiz', {
+        emit_to_session('new_quiz', {
             'session_id': session_id,
             'id': quiz.id,
             'question': question,
             'options': options,
-            'timestamp': quiz.timestamp.isoformat()
-        }, room=f'session_{session_id}')
+            'timestamp': quiz.timestamp
+        }, session_id)
         
         flash('Quiz créé avec succès !', 'success')
         return redirect(url_for('sessions.manage_session', session_id=session_id))
@@ -78,6 +88,10 @@ def delete_quiz(session_id, quiz_id):
         QuizResponse.query.filter_by(quiz_id=quiz_id).delete()
         db.session.delete(quiz)
         db.session.commit()
+        with redis_pipeline() as pipe:
+            invalidate_snapshot(session_id, pipe=pipe)
+            delete_tally(quiz_id, pipe=pipe)
+            delete_quiz_meta(quiz_id, pipe)
         flash('Quiz supprimé avec succès', 'success')
     except Exception as e:
         db.session.rollback()
@@ -94,49 +108,39 @@ def respond_quiz(session_id, quiz_id):
             return jsonify({'status': 'error', 'message': 'Données invalides'}), 400
         
         device_id = data.get('device_id')
-        selected_option = int(data.get('selected_option'))
+        try:
+            selected_option = int(data.get('selected_option'))
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'Option de réponse invalide'}), 400
         
         if not device_id:
             return jsonify({'status': 'error', 'message': 'ID d\'appareil manquant'}), 400
         
-        # Récupérer le quiz pour vérifier la réponse
-        quiz = Quiz.query.get_or_404(quiz_id)
-        
-        # Vérifier si cet appareil a déjà répondu à ce quiz
-        existing_response = QuizResponse.query.filter_by(
-            quiz_id=quiz_id,
-            device_id=device_id
-        ).first()
-        
-        if existing_response:
+        # Vérifier le quiz et l'option, puis enregistrer la réponse (insertion différée par lots)
+        # si cet appareil n'a pas déjà répondu : première réponse gagnante, atomique dans Redis
+        try:
+            quiz = submit_response(quiz_id, selected_option, device_id=device_id, session_id=session_id)
+        except LookupError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        if not quiz:
             return jsonify({
                 'status': 'error',
                 'message': 'Vous avez déjà répondu à ce quiz'
             }), 400
         
-        # Enregistrer la nouvelle réponse
-        response = QuizResponse(
-            quiz_id=quiz_id,
-            device_id=device_id,
-            selected_option=selected_option,
-            timestamp=datetime.now()
-        )
-        db.session.add(response)
-        db.session.commit()
-        
-        socketio.emit('new_quiz_response', {
-            'session_id': session_id,
-            'quiz_id': quiz_id,
-            'selected_option': selected_option
-        }, room=f'session_{session_id}')
+        record_answer(session_id, quiz_id)
         
         # Vérifier si la réponse est correcte
-        is_correct = (selected_option == quiz.correct_answer)
+        is_correct = (selected_option == quiz['correct_answer'])
         
         return jsonify({
             'status': 'success',
             'is_correct': is_correct,
-            'correct_answer': quiz.correct_answer
+            'correct_answer': quiz['correct_answer'],
+            # Rang et score de l'appareil, et son identifiant affiché dans le classement diffusé
+            'leaderboard': get_position(session_id, device_id)
         })
     
     except Exception as e:
@@ -147,50 +151,18 @@ def respond_quiz(session_id, quiz_id):
 @login_required
 def quiz_results(session_id, quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    
-    # Compter les réponses par option
-    results = db.session.query(
-        QuizResponse.selected_option,
-        func.count(QuizResponse.id).label('count')
-    ).filter_by(quiz_id=quiz_id).group_by(QuizResponse.selected_option).all()
-    
-    # Convertir en format facile à utiliser
-    results_dict = {opt: 0 for opt in range(len(quiz.options))}
-    for r in results:
-        results_dict[r.selected_option] = r.count
+    results = build_quiz_results(quiz)
     
     return render_template(
         'quiz_results.html', 
         quiz=quiz, 
-        results=results_dict,
+        results=dict(enumerate(results['results'])),
         session_id=session_id,
-        total_responses=sum(results_dict.values())
+        total_responses=results['total_responses'],
+        correct_rate=results['correct_rate']
     )
 
 @quizzes_bp.route('/api/session/<int:session_id>/quiz/<int:quiz_id>/results')
 def api_quiz_results(session_id, quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    
-    # Compter les réponses par option
-    results = db.session.query(
-        QuizResponse.selected_option,
-        func.count(QuizResponse.id).label('count')
-    ).filter_by(quiz_id=quiz_id).group_by(QuizResponse.selected_option).all()
-    
-    # Convertir en format facile à utiliser
-    results_dict = {opt: 0 for opt in range(len(quiz.options))}
-    for r in results:
-        results_dict[r.selected_option] = r.count
-    
-    total_responses = sum(results_dict.values())
-    
-    # Préparer les données pour le JSON
-    response_data = {
-        'quiz_id': quiz_id,
-        'question': quiz.question,
-        'options': quiz.options,
-        'results': [results_dict.get(i, 0) for i in range(len(quiz.options))],
-        'total_responses': total_responses
-    }
-    
-    return jsonify(response_data)
\ No newline at end of file
+    return jsonify(build_quiz_results(quiz))
@@ -1,45 +1,23 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
 from flask_login import login_required, current_user
-from extensions import db, socketio, redis_client
+from extensions import db, redis_pipeline
 from models import Session, Question, Quiz, QuizResponse
 import uuid
 from datetime import datetime, timedelta
 import json
 import logging
+from services.snapshot import invalidate_snapshot
+from services.current_session import invalidate_current_session
+from services.expiry import schedule_session_end, unschedule_session
+from services.pagination import keyset_page
+from services.transcript import record_question, close_transcript, delete_transcript
+from services.leaderboard import snapshot_leaderboard, delete_leaderboard
+from services.payloads import emit_to_session
+from services.streams import index_stream_key, unindex_stream_key
 
 sessions_bp = Blueprint('sessions', __name__)
 logger = logging.getLogger(__name__)
 
-def check_expired_sessions(app):
-    """Vérifie et termine automatiquement les sessions expirées"""
-    with app.app_context():  # Utiliser l'application passée en paramètre
-        try:
-            now = datetime.utcnow()
-            # Sessions en cours dont l'heure de fin est dépassée
-            expired_sessions = Session.query.filter(
-                Session.end_time <= now,
-                Session.status.in_(['live', 'scheduled'])
-            ).all()
-
-            for session in expired_sessions:
-                try:
-                    logger.info(f"Terminaison automatique de la session {session.id} (dépassée)")
-                    session.status = 'ended'
-                    db.session.commit()
-                    
-                    # Émettre l'événement de fin de session
-                    socketio.emit('session_auto_ended', {
-                        'session_id': session.id,
-                        'message': 'Session terminée automatiquement'
-                    }, room=f'session_{session.id}')
-                    
-                except Exception as e:
-                    db.session.rollback()
-                    logger.error(f"Erreur lors de la terminaison auto de la session {session.id}: {str(e)}")
-                    
-        except Exception as e:
-            logger.error(f"Erreur générale dans check_expired_sessions: {str(e)}")
-
 @sessions_bp.route('/create_session', methods=['GET', 'POST'])
 @login_required
 def create_session():
@@ -67,6 +45,8 @@ def create_session():
             
             db.session.add(session)
             db.session.commit()
+            schedule_session_end(session)
+            index_stream_key(session)
             flash('Session créée avec succès !', 'success')
             return redirect(url_for('main.dashboard'))
             
@@ -92,10 +72,14 @@ def manage_session(session_id):
     if session.status == 'live' and datetime.utcnow() >= session.end_time:
         session.status = 'ended'
         db.session.commit()
-        socketio.emit('session_auto_ended', {
-            'session_id': session_id,
+        invalidate_current_session()
+        unschedule_session(session_id)
+        close_transcript(session_id)
+        snapshot_leaderboard(session_id)
+        emit_to_session('session_auto_ended', {
+            'session_ids': [session_id],
             'message': 'Session terminée automatiquement'
-        }, room=f'session_{session_id}')
+        }, session_id)
     
     if request.method == 'POST':
         try:
@@ -106,19 +90,25 @@ def manage_session(session_id):
                 
                 session.status = 'live'
                 db.session.commit()
-                socketio.emit('session_status_changed', {
+                invalidate_current_session()
+                schedule_session_end(session)
+                emit_to_session('session_status_changed', {
                     'session_id': session_id,
                     'status': 'live'
-                }, room=f'session_{session_id}')
+                }, session_id)
                 flash('Session démarrée avec succès !', 'success')
                 
             elif 'stop' in request.form:
                 session.status = 'ended'
                 db.session.commit()
-                socketio.emit('session_status_changed', {
+                invalidate_current_session()
+                unschedule_session(session_id)
+                close_transcript(session_id)
+                snapshot_leaderboard(session_id)
+                emit_to_session('session_status_changed', {
                     'session_id': session_id,
                     'status': 'ended'
-                }, room=f'session_{session_id}')
+                }, session_id)
                 flash('Session arrêtée avec succès !', 'success')
                 
             elif 'answer' in request.form:
@@ -132,20 +122,17 @@ def manage_session(session_id):
                 
                 question.answer_text = answer_text
                 db.session.commit()
+                with redis_pipeline() as pipe:
+                    record_question(pipe, question)
+                    invalidate_snapshot(session_id, pipe=pipe)
                 
-                if redis_client:
-                    redis_client.rpush(
-                        f"session:{session_id}:questions", 
-                        f"Q:{question.question_text}|A:{answer_text}"
-                    )
-                
-                socketio.emit('new_answer', {
+                emit_to_session('new_answer', {
                     'session_id': session_id,
                     'question_id': question.id,
                     'question_text': question.question_text,
                     'answer_text': answer_text,
-                    'timestamp': question.timestamp.isoformat()
-                }, room=f'session_{session_id}')
+                    'timestamp': question.timestamp
+                }, session_id)
                 
                 flash('Réponse enregistrée avec succès !', 'success')
                 
@@ -157,8 +144,15 @@ def manage_session(session_id):
                     QuizResponse.query.filter(QuizResponse.quiz_id.in_(quiz_ids)).delete(synchronize_session=False)
                     db.session.flush()
                 
+                stream_key = session.stream_key
                 db.session.delete(session)
                 db.session.commit()
+                invalidate_snapshot(session_id)
+                invalidate_current_session()
+                unschedule_session(session_id)
+                delete_transcript(session_id)
+                delete_leaderboard(session_id)
+                unindex_stream_key(stream_key)
                 
                 flash('Session et tous ses contenus supprimés avec succès', 'success')
                 return redirect(url_for('main.dashboard'))
@@ -168,7 +162,14 @@ def manage_session(session_id):
             logger.error(f"Erreur lors de la suppression de la session {session_id}: {str(e)}")
             flash(f"Erreur lors de la suppression: {str(e)}", 'danger')
     
-    questions = Question.query.filter_by(session_id=session_id).order_by(Question.timestamp.asc()).all()
+    # Questions les plus récentes d'abord, paginées par curseur (?questions_after=)
+    try:
+        questions, next_questions = keyset_page(
+            Question.query.filter_by(session_id=session_id), Question,
+            after=request.args.get('questions_after'), descending=True
+        )
+    except ValueError:
+        abort(400)
     quizzes = Quiz.query.filter_by(session_id=session_id).order_by(Quiz.timestamp.desc()).all()
     
     rtmp_url = f"rtmp://{current_app.config['SRS_SERVER']}:{current_app.config['SRS_RTMP_PORT']}/live/{session.stream_key}"
@@ -178,6 +179,7 @@ def manage_session(session_id):
         'manage_session.html',
         session=session,
         questions=questions,
+        next_questions=next_questions,
         quizzes=quizzes,
         rtmp_url=rtmp_url,
         hls_url=hls_url,
@@ -201,8 +203,15 @@ def delete_session(session_id):
             QuizResponse.query.filter(QuizResponse.quiz_id.in_(quiz_ids)).delete(synchronize_session=False)
             db.session.flush()
         
+        stream_key = session.stream_key
         db.session.delete(session)
         db.session.commit()
+        invalidate_snapshot(session_id)
+        invalidate_current_session()
+        unschedule_session(session_id)
+        delete_transcript(session_id)
+        delete_leaderboard(session_id)
+        unindex_stream_key(stream_key)
             
         flash('Session supprimée avec succès', 'success')
         return redirect(url_for('admin.admin_dashboard' if current_user.role == 'admin' else 'main.dashboard'))
@@ -0,0 +1,63 @@
+from flask import Blueprint, request, jsonify, current_app
+import logging
+from services.current_session import is_session_live
+from services.streams import lookup_session_id, mark_stream_live, schedule_stream_end
+
+srs_hooks_bp = Blueprint('srs_hooks', __name__, url_prefix='/srs')
+logger = logging.getLogger(__name__)
+
+# SRS accepte l'action si la réponse est HTTP 200 avec code 0, la refuse sinon
+ACCEPT = {'code': 0, 'msg': 'OK'}
+REJECT = {'code': 1, 'msg': 'Refusé'}
+
+def _hook_data():
+    secret = current_app.config['SRS_HOOK_SECRET']
+    if secret and request.args.get('secret') != secret:
+        return None
+    data = request.get_json(silent=True) or {}
+    if data.get('app') != 'live' or not data.get('stream'):
+        return None
+    return data
+
+@srs_hooks_bp.route('/on_publish', methods=['POST'])
+def on_publish():
+    data = _hook_data()
+    if data is None:
+        return jsonify(REJECT)
+    try:
+        session_id = lookup_session_id(data['stream'])
+        if session_id is None or not mark_stream_live(session_id):
+            logger.warning(f"Diffusion refusée pour la clé {data['stream']} (client {data.get('client_id')})")
+            return jsonify(REJECT)
+        return jsonify(ACCEPT)
+    except Exception as e:
+        logger.error(f"Erreur dans le callback on_publish: {str(e)}")
+        return jsonify(REJECT)
+
+@srs_hooks_bp.route('/on_unpublish', methods=['POST'])
+def on_unpublish():
+    data = _hook_data()
+    if data is None:
+        return jsonify(ACCEPT)
+    try:
+        session_id = lookup_session_id(data['stream'])
+        if session_id is not None:
+            schedule_stream_end(session_id)
+    except Exception as e:
+        logger.error(f"Erreur dans le callback on_unpublish: {str(e)}")
+    # SRS ignore la réponse d'on_unpublish : toujours acquitter
+    return jsonify(ACCEPT)
+
+@srs_hooks_bp.route('/on_play', methods=['POST'])
+def on_play():
+    data = _hook_data()
+    if data is None:
+        return jsonify(REJECT)
+    try:
+        session_id = lookup_session_id(data['stream'])
+        if session_id is None or not is_session_live(session_id):
+            return jsonify(REJECT)
+        return jsonify(ACCEPT)
+    except Exception as e:
+        logger.error(f"Erreur dans le callback on_play: {str(e)}")
+        return jsonify(REJECT)
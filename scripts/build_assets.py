@@ -0,0 +1,37 @@
+"""Construit les fichiers statiques empreintés et précompressés (static/dist).
+
+Lancé à la construction de l'image Docker ; à relancer en local après une
+modification de static/ pour tester le mode production :
+
+    python scripts/build_assets.py
+    python scripts/build_assets.py --static-dir /chemin/vers/static
+
+Les variantes brotli ne sont produites que si le module brotli est installé.
+"""
+import argparse
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--static-dir', default=os.path.join(ROOT, 'static'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.path.insert(0, ROOT)
+    from services.assets import build_assets
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        logging.warning("Module brotli absent : seules les variantes gzip sont produites")
+    manifest = build_assets(args.static_dir)
+    print(f"{len(manifest)} fichiers empreintés dans {os.path.join(args.static_dir, 'dist')}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Faux SRS : envoie à l'application les callbacks http_hooks d'une diffusion.
+
+Permet de tester le passage automatique des sessions en direct / terminées
+sans encodeur ni serveur SRS :
+
+    python scripts/fake_srs.py session_1a2b3c4d publish
+    python scripts/fake_srs.py session_1a2b3c4d play
+    python scripts/fake_srs.py session_1a2b3c4d unpublish
+    python scripts/fake_srs.py session_1a2b3c4d cycle --hold 10
+
+Le corps des requêtes reprend celui de SRS 5 ; le code de sortie est 0 si
+l'application a accepté chaque action.
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+ACTIONS = ('publish', 'play', 'unpublish')
+
+
+def send(base_url, action, stream, secret=None, client_id=None):
+    payload = {
+        'server_id': 'vid-fake',
+        'service_id': 'fake',
+        'action': f'on_{action}',
+        'client_id': client_id or uuid.uuid4().hex[:8],
+        'ip': '127.0.0.1',
+        'vhost': '__defaultVhost__',
+        'app': 'live',
+        'tcUrl': 'rtmp://127.0.0.1:1935/live',
+        'stream': stream,
+        'param': '',
+        'stream_url': f'/live/{stream}',
+        'stream_id': 'vid-fake'
+    }
+    url = f"{base_url.rstrip('/')}/srs/on_{action}"
+    if secret:
+        url += '?' + urllib.parse.urlencode({'secret': secret})
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        body = json.loads(response.read().decode('utf-8'))
+    accepted = response.status == 200 and body.get('code') == 0
+    print(f"on_{action} {stream}: {'accepté' if accepted else 'refusé'} {body}")
+    return accepted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envoie des callbacks SRS http_hooks à l'application")
+    parser.add_argument('stream', help="clé de diffusion de la session (stream_key)")
+    parser.add_argument('action', choices=ACTIONS + ('cycle',),
+                        help="callback à envoyer, ou cycle = publish, play, attente, unpublish")
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--secret', help="valeur de SRS_HOOK_SECRET si elle est définie")
+    parser.add_argument('--hold', type=float, default=5.0, help="durée de diffusion simulée pour cycle (s)")
+    args = parser.parse_args()
+
+    if args.action != 'cycle':
+        ok = send(args.base_url, args.action, args.stream, args.secret)
+    else:
+        client_id = uuid.uuid4().hex[:8]
+        ok = send(args.base_url, 'publish', args.stream, args.secret, client_id)
+        ok = send(args.base_url, 'play', args.stream, args.secret) and ok
+        time.sleep(args.hold)
+        ok = send(args.base_url, 'unpublish', args.stream, args.secret, client_id) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
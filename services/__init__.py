@@ -0,0 +1 @@
+# Services partagés par les routes, l'API et les gestionnaires de sockets
@@ -0,0 +1,219 @@
+"""Statistiques des quiz et des sessions, tenues à jour à l'ingestion des réponses.
+
+`QuizStats` garde par quiz le nombre de réponses par option, les bonnes
+réponses et l'histogramme des temps de réponse (depuis la publication du
+quiz) ; `SessionStats` cumule ces totaux par session. Le flusher les met à
+jour dans la même transaction que l'insertion du lot : les rapports se
+lisent en O(quiz), sans parcourir `QuizResponse`.
+
+- quiz verrouillés (SELECT ... FOR UPDATE, dans l'ordre des id) pour
+  les champs JSON, sessions incrémentées par UPDATE atomique ;
+- si l'INSERT ... IGNORE a écarté des doublons (relivraison du stream), les
+  quiz du lot sont recalculés depuis la base plutôt qu'incrémentés deux fois ;
+- les options invalides sont refusées à l'ingestion (check_response) ; une
+  ligne hors limites déjà en base n'est comptée dans aucun agrégat.
+"""
+import logging
+from sqlalchemy import update
+from extensions import db
+from models import Quiz, QuizResponse, QuizStats, SessionStats
+from services.tallies import get_tally
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures (secondes) de l'histogramme des temps de réponse ; un dernier seau reçoit le reste
+RESPONSE_TIME_BUCKETS = (5, 10, 20, 30, 60, 120, 300)
+
+
+def _bucket(seconds):
+    for index, bound in enumerate(RESPONSE_TIME_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(RESPONSE_TIME_BUCKETS)
+
+
+def _response_ms(quiz, timestamp):
+    return max(0, int((timestamp - quiz.timestamp).total_seconds() * 1000))
+
+
+def init_quiz_stats(quiz):
+    """Ajoute à la transaction en cours les statistiques vides d'un nouveau quiz (et de sa session)"""
+    db.session.add(QuizStats(
+        quiz=quiz,
+        session_id=quiz.session_id,
+        total_responses=0,
+        correct_responses=0,
+        option_counts=[0] * len(quiz.options),
+        response_time_buckets=[0] * (len(RESPONSE_TIME_BUCKETS) + 1),
+        response_time_sum_ms=0
+    ))
+    if db.session.get(SessionStats, quiz.session_id) is None:
+        db.session.add(SessionStats(session_id=quiz.session_id))
+
+
+def _totals(stats):
+    return (1 if stats.total_responses else 0, stats.total_responses, stats.correct_responses, stats.response_time_sum_ms)
+
+
+def _apply(stats, quiz, rows):
+    option_counts = list(stats.option_counts)
+    buckets = list(stats.response_time_buckets)
+    for row in rows:
+        # Option hors limites (réponse antérieure à la validation à l'ingestion) : ignorée
+        # par tous les compteurs, comme par les compteurs Redis
+        if not 0 <= row['selected_option'] < len(option_counts):
+            continue
+        option_counts[row['selected_option']] += 1
+        elapsed_ms = _response_ms(quiz, row['timestamp'])
+        buckets[_bucket(elapsed_ms / 1000.0)] += 1
+        stats.total_responses += 1
+        stats.correct_responses += int(row['selected_option'] == quiz.correct_answer)
+        stats.response_time_sum_ms += elapsed_ms
+        if stats.first_response_at is None or row['timestamp'] < stats.first_response_at:
+            stats.first_response_at = row['timestamp']
+        if stats.last_response_at is None or row['timestamp'] > stats.last_response_at:
+            stats.last_response_at = row['timestamp']
+    # Nouvelles listes : les colonnes JSON ne suivent pas les modifications en place
+    stats.option_counts = option_counts
+    stats.response_time_buckets = buckets
+
+
+def _reset(stats, quiz):
+    stats.total_responses = 0
+    stats.correct_responses = 0
+    stats.option_counts = [0] * len(quiz.options)
+    stats.response_time_buckets = [0] * (len(RESPONSE_TIME_BUCKETS) + 1)
+    stats.response_time_sum_ms = 0
+    stats.first_response_at = None
+    stats.last_response_at = None
+
+
+def record_responses(rows, all_inserted=True):
+    """Met à jour les statistiques pour des réponses écrites dans la transaction en cours
+    (lignes au format de `_response_row`). all_inserted=False quand des lignes ont pu être
+    ignorées comme doublons : les quiz concernés sont alors recalculés depuis la base."""
+    quiz_ids = sorted({row['quiz_id'] for row in rows})
+    if not quiz_ids:
+        return
+    quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_(quiz_ids)).all()}
+    stats_by_quiz = {stats.quiz_id: stats for stats in QuizStats.query.filter(
+        QuizStats.quiz_id.in_(quiz_ids)
+    ).order_by(QuizStats.quiz_id).with_for_update().all()}
+
+    if not all_inserted:
+        db.session.flush()
+        rows = [{
+            'quiz_id': quiz_id,
+            'selected_option': selected_option,
+            'timestamp': timestamp
+        } for quiz_id, selected_option, timestamp in db.session.query(
+            QuizResponse.quiz_id, QuizResponse.selected_option, QuizResponse.timestamp
+        ).filter(QuizResponse.quiz_id.in_(quiz_ids)).all()]
+
+    rows_by_quiz = {}
+    for row in rows:
+        rows_by_quiz.setdefault(row['quiz_id'], []).append(row)
+
+    session_deltas = {}
+    for quiz_id in quiz_ids:
+        quiz = quizzes.get(quiz_id)
+        if quiz is None:
+            continue
+        stats = stats_by_quiz.get(quiz_id)
+        if stats is None:
+            # Quiz créé sans statistiques (ne devrait pas arriver après la migration 0003)
+            init_quiz_stats(quiz)
+            stats = quiz.stats
+        before = _totals(stats)
+        if not all_inserted:
+            _reset(stats, quiz)
+        _apply(stats, quiz, rows_by_quiz.get(quiz_id, []))
+        delta = [after - previous for after, previous in zip(_totals(stats), before)]
+        current = session_deltas.setdefault(quiz.session_id, [0, 0, 0, 0])
+        session_deltas[quiz.session_id] = [a + b for a, b in zip(current, delta)]
+
+    db.session.flush()
+    for session_id, (answered, total, correct, elapsed_ms) in sorted(session_deltas.items()):
+        db.session.execute(update(SessionStats).where(SessionStats.session_id == session_id).values(
+            answered_quizzes=SessionStats.answered_quizzes + answered,
+            total_responses=SessionStats.total_responses + total,
+            correct_responses=SessionStats.correct_responses + correct,
+            response_time_sum_ms=SessionStats.response_time_sum_ms + elapsed_ms
+        ))
+
+
+def quiz_results(quiz):
+    """Résultats d'un quiz pour les trois points d'accès (page, JSON, API REST).
+    Les compteurs viennent de Redis (réponses pas encore insérées comprises), sinon de QuizStats."""
+    results = get_tally(quiz)
+    total = sum(results)
+    correct = results[quiz.correct_answer] if 0 <= quiz.correct_answer < len(results) else 0
+    return {
+        'quiz_id': quiz.id,
+        'question': quiz.question,
+        'options': quiz.options,
+        'results': results,
+        'total_responses': total,
+        'correct_answer': quiz.correct_answer,
+        'correct_responses': correct,
+        'correct_rate': round(correct / total, 4) if total else None
+    }
+
+
+def _distribution(buckets):
+    labels = [f"<= {bound} s" for bound in RESPONSE_TIME_BUCKETS] + [f"> {RESPONSE_TIME_BUCKETS[-1]} s"]
+    return [{'bucket': label, 'count': count} for label, count in zip(labels, buckets)]
+
+
+def _median_bucket(buckets):
+    """Borne du seau contenant la médiane (None au-delà du dernier seau ou sans réponse)"""
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if seen * 2 >= total:
+            return RESPONSE_TIME_BUCKETS[index] if index < len(RESPONSE_TIME_BUCKETS) else None
+    return None
+
+
+def session_report(session_id):
+    """Rapport de fin de session : participation, taux de bonnes réponses et temps de réponse
+    par quiz, plus les totaux de la session. Deux requêtes, quel que soit le nombre de réponses."""
+    rows = db.session.query(Quiz, QuizStats).outerjoin(QuizStats, QuizStats.quiz_id == Quiz.id).filter(
+        Quiz.session_id == session_id
+    ).order_by(Quiz.timestamp.asc(), Quiz.id.asc()).all()
+    totals = db.session.get(SessionStats, session_id)
+
+    quizzes = []
+    for quiz, stats in rows:
+        total = stats.total_responses if stats else 0
+        buckets = stats.response_time_buckets if stats else [0] * (len(RESPONSE_TIME_BUCKETS) + 1)
+        quizzes.append({
+            'quiz_id': quiz.id,
+            'question': quiz.question,
+            'options': quiz.options,
+            'correct_answer': quiz.correct_answer,
+            'results': stats.option_counts if stats else [0] * len(quiz.options),
+            'total_responses': total,
+            'correct_responses': stats.correct_responses if stats else 0,
+            'correct_rate': round(stats.correct_responses / total, 4) if total else None,
+            'mean_response_seconds': round(stats.response_time_sum_ms / total / 1000.0, 2) if total else None,
+            'median_response_seconds_at_most': _median_bucket(buckets),
+            'response_time_distribution': _distribution(buckets),
+            'first_response_at': stats.first_response_at.isoformat() if stats and stats.first_response_at else None,
+            'last_response_at': stats.last_response_at.isoformat() if stats and stats.last_response_at else None
+        })
+
+    total = totals.total_responses if totals else 0
+    return {
+        'session_id': int(session_id),
+        'quiz_count': len(quizzes),
+        'answered_quizzes': totals.answered_quizzes if totals else 0,
+        'total_responses': total,
+        'correct_responses': totals.correct_responses if totals else 0,
+        'correct_rate': round(totals.correct_responses / total, 4) if total else None,
+        'mean_response_seconds': round(totals.response_time_sum_ms / total / 1000.0, 2) if total else None,
+        'quizzes': quizzes
+    }
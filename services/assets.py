@@ -0,0 +1,137 @@
+"""Fichiers statiques empreintés (hash dans le nom), précompressés et mis en cache un an.
+
+`scripts/build_assets.py` (lancé à la construction de l'image) copie chaque
+fichier de `static/` dans `static/dist/` sous un nom qui contient le hash de
+son contenu, avec ses variantes `.gz` et `.br` (si le module brotli est
+installé), et écrit `static/dist/manifest.json` (nom source -> nom empreinté).
+
+Les templates appellent `asset_url('css/style.css')` au lieu de
+`url_for('static', filename='css/style.css')`. Les fichiers empreintés sont
+servis sous `/assets/` avec `Cache-Control: immutable` sur ASSET_MAX_AGE :
+un contenu modifié change d'URL, le navigateur n'a jamais à revalider. Sans
+manifeste (développement), `asset_url` retombe sur la route static de Flask.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+from flask import current_app, request, send_from_directory, url_for, abort
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Les fichiers plus petits ne gagnent rien à la compression
+MIN_COMPRESS_SIZE = 256
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/vnd.microsoft.icon')
+# Variantes précompressées, par ordre de préférence
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _fingerprinted_name(relative_path, digest):
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest[:12]}{ext}"
+
+
+def _compressible(path):
+    mimetype = mimetypes.guess_type(path)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES) and os.path.getsize(path) >= MIN_COMPRESS_SIZE
+
+
+def _precompress(path):
+    with open(path, 'rb') as source:
+        data = source.read()
+    written = []
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + '.gz', 'wb') as target:
+            target.write(compressed)
+        written.append('gz')
+    try:
+        import brotli
+    except ImportError:
+        return written
+    compressed = brotli.compress(data, quality=11)
+    if len(compressed) < len(data):
+        with open(path + '.br', 'wb') as target:
+            target.write(compressed)
+        written.append('br')
+    return written
+
+
+def build_assets(static_dir):
+    """Reconstruit static/dist et son manifeste ; retourne le manifeste"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    manifest = {}
+    for directory, subdirs, files in os.walk(static_dir):
+        if os.path.abspath(directory) == os.path.abspath(static_dir) and DIST_DIR in subdirs:
+            subdirs.remove(DIST_DIR)
+        for name in sorted(files):
+            source = os.path.join(directory, name)
+            relative_path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as handle:
+                digest = hashlib.sha256(handle.read()).hexdigest()
+            fingerprinted = _fingerprinted_name(relative_path, digest)
+            target = os.path.join(dist_dir, fingerprinted)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            variants = _precompress(target) if _compressible(target) else []
+            manifest[relative_path] = fingerprinted
+            logger.info(f"{relative_path} -> {fingerprinted} {' '.join(variants)}".rstrip())
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir):
+    path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture du manifeste des fichiers statiques: {str(e)}")
+        return {}
+
+
+def asset_url(filename, **values):
+    """Comme url_for('static', filename=...), mais vers la version empreintée si elle existe"""
+    fingerprinted = current_app.asset_manifest.get(filename)
+    if fingerprinted is None:
+        return url_for('static', filename=filename, **values)
+    return url_for('assets', filename=fingerprinted, **values)
+
+
+def serve_asset(filename):
+    """Fichier empreinté, dans la variante précompressée acceptée par le client"""
+    if filename not in current_app.asset_files:
+        abort(404)
+    dist_dir = os.path.join(current_app.static_folder, DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    served, encoding = filename, None
+    for name, suffix in ENCODINGS:
+        if name in request.accept_encodings and os.path.exists(os.path.join(dist_dir, filename + suffix)):
+            served, encoding = filename + suffix, name
+            break
+    response = send_from_directory(dist_dir, served, mimetype=mimetype, max_age=current_app.config['ASSET_MAX_AGE'])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    """Charge le manifeste et branche /assets/ et asset_url sur l'application"""
+    app.asset_manifest = load_manifest(app.static_folder)
+    app.asset_files = frozenset(app.asset_manifest.values())
+    if app.asset_manifest:
+        logger.info(f"{len(app.asset_manifest)} fichiers statiques empreintés chargés")
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
@@ -0,0 +1,77 @@
+"""Préparation unique de la base, hors du démarrage des workers.
+
+`flask bootstrap` applique les migrations livrées dans `migrations/` puis crée
+l'administrateur par défaut (ADMIN_NAME, ADMIN_EMAIL, ADMIN_PASSWORD) s'il
+n'existe pas. L'entrypoint la lance une fois avant gunicorn ; les réplicas
+supplémentaires démarrent avec FAST_START=true et n'ont plus rien à préparer.
+"""
+import logging
+import os
+import click
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_migrate import upgrade, stamp
+from sqlalchemy import inspect
+from werkzeug.security import generate_password_hash
+from extensions import db
+from models import User
+
+logger = logging.getLogger(__name__)
+
+# Première révision livrée : le schéma que produisaient create_all et les migrations générées au démarrage
+BASELINE_REVISION = '0001_initial'
+
+
+def _adopt_legacy_schema():
+    """Marque à la révision initiale une base créée avant la livraison des migrations
+    (tables présentes, mais révision absente ou générée au démarrage et inconnue ici)"""
+    directory = current_app.extensions['migrate'].directory
+    scripts = ScriptDirectory.from_config(current_app.extensions['migrate'].migrate.get_config(directory))
+    with db.engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+        has_tables = inspect(connection).has_table('user')
+    if not has_tables:
+        return
+    if current is not None:
+        try:
+            scripts.get_revision(current)
+            return
+        except Exception:
+            pass
+    logger.warning(f"Base existante à la révision inconnue {current} : marquée à {BASELINE_REVISION}")
+    stamp(directory=directory, revision=BASELINE_REVISION, purge=True)
+
+
+def ensure_admin():
+    """Crée l'administrateur par défaut s'il est configuré et absent. Retourne True s'il a été créé."""
+    admin_name = os.getenv('ADMIN_NAME')
+    admin_email = os.getenv('ADMIN_EMAIL')
+    admin_password = os.getenv('ADMIN_PASSWORD')
+    if not (admin_name and admin_email and admin_password):
+        return False
+    if User.query.filter_by(email=admin_email).first():
+        return False
+    db.session.add(User(
+        username=admin_name,
+        email=admin_email,
+        password_hash=generate_password_hash(admin_password),
+        role='admin'
+    ))
+    db.session.commit()
+    logger.info(f"Administrateur {admin_name} créé")
+    return True
+
+
+@click.command('bootstrap')
+@click.option('--skip-migrations', is_flag=True, help="Ne crée que l'administrateur par défaut")
+@with_appcontext
+def bootstrap_command(skip_migrations):
+    """Applique les migrations et crée l'administrateur par défaut (idempotent)."""
+    if not skip_migrations:
+        _adopt_legacy_schema()
+        upgrade(directory=current_app.extensions['migrate'].directory)
+    if ensure_admin():
+        click.echo(f"Administrateur {os.getenv('ADMIN_NAME')} créé")
+    click.echo("Base de données prête")
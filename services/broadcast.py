@@ -0,0 +1,84 @@
+import logging
+import time
+from flask import current_app
+from extensions import db, socketio
+from models import Quiz
+from services.metrics import TALLY_ANSWERS, TALLY_BROADCASTS, TALLY_BATCH_SIZE, BACKGROUND_JOB_SECONDS
+from services.tallies import get_tally, read_tally
+from services.leaderboard import top_many
+from services.payloads import emit_to_session
+
+logger = logging.getLogger(__name__)
+
+
+class TallyCoalescer:
+    """Regroupe les réponses par quiz sur une fenêtre et émet un seul quiz_tally par quiz,
+    puis un seul leaderboard_update par session.
+
+    Le nombre de trames envoyées passe de O(réponses x spectateurs) à
+    O(fenêtres x spectateurs). Chaque worker regroupe les réponses qu'il reçoit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.window = app.config['TALLY_BROADCAST_WINDOW_MS'] / 1000.0
+        self._pending = {}
+        self._running = False
+
+    def start(self):
+        self._running = True
+        socketio.start_background_task(self._run)
+
+    def record(self, session_id, quiz_id):
+        TALLY_ANSWERS.inc()
+        key = (int(session_id), int(quiz_id))
+        self._pending[key] = self._pending.get(key, 0) + 1
+        # Sans boucle de diffusion (BACKGROUND_SERVICES=false) : diffusion immédiate
+        if not self._running:
+            self.flush()
+
+    def _run(self):
+        while self._running:
+            time.sleep(self.window)
+            if not self._pending:
+                continue
+            try:
+                with BACKGROUND_JOB_SECONDS.labels(job='tally_broadcast').time():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Erreur lors de la diffusion des résultats de quiz: {str(e)}")
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        with self.app.app_context():
+            for (session_id, quiz_id), batch_size in pending.items():
+                results = read_tally(quiz_id)
+                if results is None:
+                    quiz = db.session.get(Quiz, quiz_id)
+                    if quiz is None:
+                        continue
+                    results = get_tally(quiz)
+                emit_to_session('quiz_tally', {
+                    'session_id': session_id,
+                    'quiz_id': quiz_id,
+                    'results': results,
+                    'total_responses': sum(results)
+                }, session_id)
+                TALLY_BROADCASTS.inc()
+                TALLY_BATCH_SIZE.observe(batch_size)
+            # Classement des sessions ayant reçu des réponses : un seul aller-retour Redis
+            session_ids = sorted({session_id for session_id, _ in pending})
+            for session_id, top in top_many(session_ids, self.app.config['LEADERBOARD_TOP_N']).items():
+                if not top:
+                    continue
+                emit_to_session('leaderboard_update', {
+                    'session_id': session_id,
+                    'top': top
+                }, session_id)
+
+
+def record_answer(session_id, quiz_id):
+    """Signale une réponse : le résultat agrégé sera diffusé à la fin de la fenêtre en cours"""
+    current_app.tally_coalescer.record(session_id, quiz_id)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import time
+from flask import current_app
+from flask_restx import marshal
+from extensions import get_redis
+from models import Session
+
+logger = logging.getLogger(__name__)
+
+CURRENT_SESSION_KEY = "sessions:current"
+# Date (epoch) du dernier changement de statut, servie en Last-Modified
+CHANGED_AT_KEY = "sessions:current:changed_at"
+# Statut en direct par session (1/0), pour les callbacks on_play de SRS ; même invalidation
+LIVE_STATUS_KEY = "sessions:live_status"
+
+
+def _build_entry(session_model, last_modified):
+    """Interroge la base et prépare la représentation HTTP de la session en direct"""
+    session = Session.query.filter_by(status='live').first()
+    if session:
+        status = 200
+        body = marshal({
+            'id': session.id,
+            'title': session.title,
+            'description': session.description,
+            'start_time': session.start_time,
+            'end_time': session.end_time,
+            'status': session.status,
+            'stream_key': session.stream_key,
+            'user_id': session.user_id,
+            'hls_url': f"http://{current_app.config['SRS_SERVER']}:{current_app.config['SRS_HTTP_PORT']}/live/{session.stream_key}.m3u8"
+        }, session_model)
+    else:
+        status = 404
+        body = {'message': 'No live session'}
+    body = json.dumps(body, separators=(',', ':'))
+    return {
+        'status': status,
+        'body': body,
+        'etag': hashlib.sha1(body.encode('utf-8')).hexdigest()[:16],
+        'last_modified': last_modified
+    }
+
+
+def _changed_at(redis_client):
+    """Date du dernier changement de statut : une reconstruction du cache (TTL) ne la modifie pas"""
+    now = int(time.time())
+    if not redis_client:
+        return now
+    try:
+        # Première lecture sans changement enregistré : la date est fixée une fois pour toutes
+        redis_client.set(CHANGED_AT_KEY, now, nx=True)
+        return int(redis_client.get(CHANGED_AT_KEY) or now)
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de la date de changement de la session courante: {str(e)}")
+        return now
+
+
+def get_current_session(session_model):
+    """Retourne la session en direct depuis le cache Redis (la base seulement après invalidation)"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            cached = redis_client.get(CURRENT_SESSION_KEY)
+            if cached is not None:
+                return json.loads(cached)
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture de la session courante en cache: {str(e)}")
+
+    entry = _build_entry(session_model, _changed_at(redis_client))
+    if redis_client:
+        try:
+            redis_client.set(CURRENT_SESSION_KEY, json.dumps(entry), ex=current_app.config['CURRENT_SESSION_TTL'])
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise en cache de la session courante: {str(e)}")
+    return entry
+
+
+def is_session_live(session_id):
+    """La session est-elle en direct ? Lu dans Redis ; la base n'est interrogée qu'après invalidation"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            cached = redis_client.hget(LIVE_STATUS_KEY, str(session_id))
+            if cached is not None:
+                return cached == b'1'
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture du statut en cache de la session {session_id}: {str(e)}")
+
+    live = Session.query.filter(
+        Session.id == session_id,
+        Session.status == 'live'
+    ).count() > 0
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(LIVE_STATUS_KEY, str(session_id), int(live))
+            pipe.expire(LIVE_STATUS_KEY, current_app.config['CURRENT_SESSION_TTL'])
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise en cache du statut de la session {session_id}: {str(e)}")
+    return live
+
+
+def invalidate_current_session():
+    """À appeler après chaque changement de statut d'une session"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.delete(CURRENT_SESSION_KEY, LIVE_STATUS_KEY)
+            pipe.set(CHANGED_AT_KEY, int(time.time()))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Erreur lors de l'invalidation de la session courante: {str(e)}")
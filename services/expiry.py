@@ -0,0 +1,160 @@
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from extensions import db, socketio, get_redis
+from models import Session
+from services.current_session import invalidate_current_session
+from services.transcript import close_transcript
+from services.leaderboard import snapshot_leaderboard
+from services.payloads import emit_to_sessions
+from services.metrics import BACKGROUND_JOB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEADLINES_KEY = "sessions:deadlines"
+LEADER_KEY = "lock:session_expiry"
+ACTIVE_STATUSES = ('live', 'scheduled')
+
+# Renouvelle le verrou seulement s'il appartient encore à ce worker
+RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _epoch(dt):
+    # Les heures de fin sont stockées en UTC naïf
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def schedule_session_end(session):
+    """Enregistre l'heure de fin d'une session dans l'échéancier"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.zadd(DEADLINES_KEY, {str(session.id): _epoch(session.end_time)})
+        except Exception as e:
+            logger.error(f"Erreur lors de la planification de la fin de la session {session.id}: {str(e)}")
+
+
+def unschedule_session(session_id):
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.zrem(DEADLINES_KEY, str(session_id))
+        except Exception as e:
+            logger.error(f"Erreur lors de la déplanification de la session {session_id}: {str(e)}")
+
+
+def expire_due_sessions(now=None):
+    """Termine en un seul UPDATE toutes les sessions échues et notifie leurs salles en un seul emit.
+    Retourne la liste des sessions terminées."""
+    now = now or datetime.utcnow()
+    due = Session.query.with_entities(Session.id).filter(
+        Session.end_time <= now,
+        Session.status.in_(ACTIVE_STATUSES)
+    ).all()
+    session_ids = [session_id for (session_id,) in due]
+    if session_ids:
+        Session.query.filter(
+            Session.id.in_(session_ids),
+            Session.status.in_(ACTIVE_STATUSES)
+        ).update({'status': 'ended'}, synchronize_session=False)
+        db.session.commit()
+        logger.info(f"Terminaison automatique des sessions {session_ids} (dépassées)")
+        invalidate_current_session()
+        for session_id in session_ids:
+            close_transcript(session_id)
+            snapshot_leaderboard(session_id)
+        emit_to_sessions('session_auto_ended', {
+            'session_ids': session_ids,
+            'message': 'Session terminée automatiquement'
+        }, session_ids)
+
+    redis_client = get_redis()
+    if redis_client:
+        redis_client.zremrangebyscore(DEADLINES_KEY, '-inf', _epoch(now))
+    return session_ids
+
+
+class SessionExpiryEngine:
+    """Termine les sessions à leur heure de fin, et celles dont la diffusion
+    n'a pas repris à la fin du délai de grâce (services/streams.py).
+
+    Un seul worker est élu via un verrou Redis ; il dort jusqu'à la prochaine
+    échéance des ensembles triés (plafonné à SESSION_EXPIRY_MAX_SLEEP pour voir
+    les sessions planifiées entre-temps), sans requête SQL entre deux échéances.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.max_sleep = app.config['SESSION_EXPIRY_MAX_SLEEP']
+        self.lock_ttl_ms = int(self.max_sleep * 3 * 1000)
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._leader = False
+        self._seeded = False
+        self._running = False
+        self._renew_script = None
+
+    def start(self):
+        if not get_redis():
+            logger.warning("Redis indisponible : terminaison automatique des sessions désactivée")
+            return
+        self._running = True
+        socketio.start_background_task(self._run)
+
+    def _hold_leadership(self, redis_client):
+        if self._renew_script is None:
+            self._renew_script = redis_client.register_script(RENEW_LUA)
+        if self._renew_script(keys=[LEADER_KEY], args=[self.owner, self.lock_ttl_ms]):
+            self._leader = True
+        elif redis_client.set(LEADER_KEY, self.owner, nx=True, px=self.lock_ttl_ms):
+            logger.info(f"Worker {self.owner} élu pour la terminaison des sessions")
+            self._leader = True
+            self._seeded = False
+        else:
+            self._leader = False
+        if self._leader and not self._seeded:
+            self._seed()
+            self._seeded = True
+        return self._leader
+
+    def _seed(self):
+        """Recharge l'échéancier depuis la base à chaque prise de leadership"""
+        with self.app.app_context():
+            sessions = Session.query.with_entities(Session.id, Session.end_time).filter(
+                Session.status.in_(ACTIVE_STATUSES)
+            ).all()
+        if sessions:
+            get_redis().zadd(DEADLINES_KEY, {str(session_id): _epoch(end_time) for session_id, end_time in sessions})
+
+    def _run(self):
+        # Import différé : services.streams dépend de ce module
+        from services.streams import end_dropped_streams, next_stream_end
+        while self._running:
+            delay = self.max_sleep
+            try:
+                redis_client = get_redis()
+                if self._hold_leadership(redis_client):
+                    stream_end = next_stream_end()
+                    if stream_end is not None:
+                        delay = stream_end - time.time()
+                        if delay <= 0:
+                            with self.app.app_context(), BACKGROUND_JOB_SECONDS.labels(job='stream_end').time():
+                                end_dropped_streams()
+                            continue
+                    upcoming = redis_client.zrange(DEADLINES_KEY, 0, 0, withscores=True)
+                    if upcoming:
+                        delay = min(delay, upcoming[0][1] - time.time())
+                        if delay <= 0:
+                            with self.app.app_context(), BACKGROUND_JOB_SECONDS.labels(job='session_expiry').time():
+                                expire_due_sessions()
+                            continue
+            except Exception as e:
+                logger.error(f"Erreur dans la terminaison automatique des sessions: {str(e)}")
+                delay = self.max_sleep
+            time.sleep(min(delay, self.max_sleep))
@@ -0,0 +1,264 @@
+"""Classement des appareils par session, dans un sorted set Redis.
+
+- `session:{id}:leaderboard` : device_id -> score ; ZINCRBY à chaque réponse,
+  top-N par ZREVRANGE et rang d'un appareil par ZREVRANK, tous en O(log n) ;
+- `quiz:{id}:meta` : bonne réponse, session, nombre d'options et date de
+  publication du quiz, écrits à sa création pour que le score se calcule dans
+  Redis, dans le même pipeline que l'ingestion de la réponse (repli sur la base
+  si la clé manque) ; ils servent aussi à valider les réponses sans requête SQL.
+
+Une bonne réponse rapporte LEADERBOARD_POINTS, plus un bonus de rapidité
+dégressif sur LEADERBOARD_SPEED_WINDOW secondes après la publication du quiz ;
+une mauvaise réponse inscrit l'appareil avec 0 point. À la fin de la session
+le classement est copié dans `LeaderboardEntry`, puis la clé expire après
+LEADERBOARD_RETENTION_AFTER_END.
+"""
+import hashlib
+import logging
+from flask import current_app
+from sqlalchemy import insert
+from extensions import db, get_redis
+from models import LeaderboardEntry, Quiz
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_KEY = "session:{session_id}:leaderboard"
+QUIZ_META_KEY = "quiz:{quiz_id}:meta"
+
+# Résultat du script quand les métadonnées du quiz sont absentes de Redis
+MISSING_META = -1
+
+# Score calculé côté Redis : même formule que _points ; une réponse adressée à une
+# autre session que celle du quiz n'est pas comptée
+SCORE_LUA = """
+local meta = redis.call('HMGET', KEYS[1], 'correct', 'session', 'published')
+if not meta[1] then
+    return -1
+end
+if meta[2] ~= ARGV[2] then
+    return 0
+end
+local points = 0
+if tonumber(ARGV[3]) == tonumber(meta[1]) then
+    points = tonumber(ARGV[5])
+    local bonus = tonumber(ARGV[6])
+    local window = tonumber(ARGV[7])
+    local elapsed = math.max(0, tonumber(ARGV[4]) - tonumber(meta[3]))
+    if bonus > 0 and window > 0 and elapsed < window then
+        points = points + math.floor(bonus * (1 - elapsed / window) + 0.5)
+    end
+end
+redis.call('ZINCRBY', KEYS[2], points, ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[8])
+return points
+"""
+
+_score_script = None
+
+
+def _leaderboard_key(session_id):
+    return LEADERBOARD_KEY.format(session_id=int(session_id))
+
+
+def _meta_key(quiz_id):
+    return QUIZ_META_KEY.format(quiz_id=int(quiz_id))
+
+
+def _script(redis_client):
+    global _score_script
+    if _score_script is None:
+        _score_script = redis_client.register_script(SCORE_LUA)
+    return _score_script
+
+
+def player_tag(device_id):
+    """Identifiant affichable d'un appareil : le device_id sert à répondre et n'est pas diffusé"""
+    if isinstance(device_id, bytes):
+        device_id = device_id.decode('utf-8')
+    return hashlib.sha1(device_id.encode('utf-8')).hexdigest()[:6].upper()
+
+
+def _points(correct, elapsed_seconds):
+    if not correct:
+        return 0
+    config = current_app.config
+    points = config['LEADERBOARD_POINTS']
+    bonus, window = config['LEADERBOARD_SPEED_BONUS'], config['LEADERBOARD_SPEED_WINDOW']
+    elapsed = max(0.0, elapsed_seconds)
+    if bonus > 0 and window > 0 and elapsed < window:
+        points += int(bonus * (1 - elapsed / window) + 0.5)
+    return points
+
+
+def store_quiz_meta(quiz, pipe):
+    """Ajoute au pipeline les métadonnées de score d'un nouveau quiz"""
+    if pipe is None:
+        return
+    key = _meta_key(quiz.id)
+    pipe.hset(key, mapping={
+        'correct': quiz.correct_answer,
+        'session': quiz.session_id,
+        'options': len(quiz.options),
+        'published': quiz.timestamp.timestamp()
+    })
+    pipe.expire(key, current_app.config['TALLY_TTL'])
+
+
+def quiz_meta(quiz_id):
+    """Session, nombre d'options et bonne réponse d'un quiz : Redis, puis base (et remise en cache).
+    None si le quiz n'existe pas."""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            session_id, options, correct = redis_client.hmget(_meta_key(quiz_id), 'session', 'options', 'correct')
+            if options is not None:
+                return {'session_id': int(session_id), 'options': int(options), 'correct_answer': int(correct)}
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture des métadonnées du quiz {quiz_id}: {str(e)}")
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None:
+        return None
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            store_quiz_meta(quiz, pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise en cache des métadonnées du quiz {quiz_id}: {str(e)}")
+    return {'session_id': quiz.session_id, 'options': len(quiz.options), 'correct_answer': quiz.correct_answer}
+
+
+def delete_quiz_meta(quiz_id, pipe):
+    if pipe is not None:
+        pipe.delete(_meta_key(quiz_id))
+
+
+def queue_score(redis_client, pipe, session_id, quiz_id, device_id, selected_option, timestamp):
+    """Ajoute le calcul du score d'une réponse au pipeline d'ingestion.
+    Le résultat vaut MISSING_META si le quiz n'est pas connu de Redis (voir score_from_db)."""
+    config = current_app.config
+    _script(redis_client)(
+        keys=[_meta_key(quiz_id), _leaderboard_key(session_id)],
+        args=[
+            device_id,
+            int(session_id),
+            int(selected_option),
+            timestamp.timestamp(),
+            config['LEADERBOARD_POINTS'],
+            config['LEADERBOARD_SPEED_BONUS'],
+            config['LEADERBOARD_SPEED_WINDOW'],
+            config['LEADERBOARD_TTL']
+        ],
+        client=pipe
+    )
+
+
+def score_from_db(redis_client, session_id, quiz_id, device_id, selected_option, timestamp):
+    """Repli quand les métadonnées du quiz ont expiré : les recharge depuis la base puis compte la réponse"""
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None or quiz.session_id != int(session_id):
+        return
+    key = _leaderboard_key(session_id)
+    pipe = redis_client.pipeline()
+    store_quiz_meta(quiz, pipe)
+    pipe.zincrby(key, _points(selected_option == quiz.correct_answer, (timestamp - quiz.timestamp).total_seconds()), device_id)
+    pipe.expire(key, current_app.config['LEADERBOARD_TTL'])
+    pipe.execute()
+
+
+def _entries(pairs, start_rank=1):
+    return [{'rank': start_rank + index, 'player': player_tag(device_id), 'score': int(score)}
+            for index, (device_id, score) in enumerate(pairs)]
+
+
+def _snapshot_top(session_id, limit):
+    rows = LeaderboardEntry.query.filter_by(session_id=session_id).order_by(
+        LeaderboardEntry.rank.asc()
+    ).limit(limit).all()
+    return [{'rank': row.rank, 'player': player_tag(row.device_id), 'score': row.score} for row in rows]
+
+
+def top_many(session_ids, limit):
+    """Top-N de plusieurs sessions en un aller-retour Redis (diffusion périodique)"""
+    redis_client = get_redis()
+    if not redis_client or not session_ids:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    for session_id in session_ids:
+        pipe.zrevrange(_leaderboard_key(session_id), 0, limit - 1, withscores=True)
+    return {session_id: _entries(pairs) for session_id, pairs in zip(session_ids, pipe.execute())}
+
+
+def get_top(session_id, limit):
+    """Top-N d'une session : Redis pendant la session, sinon l'instantané enregistré à sa fin"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            pairs = redis_client.zrevrange(_leaderboard_key(session_id), 0, limit - 1, withscores=True)
+            if pairs:
+                return _entries(pairs)
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture du classement de la session {session_id}: {str(e)}")
+    return _snapshot_top(session_id, limit)
+
+
+def get_position(session_id, device_id):
+    """Rang (1 = premier) et score d'un appareil ; None s'il n'a pas encore répondu"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zrevrank(_leaderboard_key(session_id), device_id)
+            pipe.zscore(_leaderboard_key(session_id), device_id)
+            position, score = pipe.execute()
+            if position is not None:
+                return {'rank': position + 1, 'player': player_tag(device_id), 'score': int(score)}
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture du rang de l'appareil {device_id}: {str(e)}")
+    row = LeaderboardEntry.query.filter_by(session_id=session_id, device_id=device_id).first()
+    if row is None:
+        return None
+    return {'rank': row.rank, 'player': player_tag(row.device_id), 'score': row.score}
+
+
+def snapshot_leaderboard(session_id):
+    """À la fin d'une session : copie le classement en base et fait expirer la clé Redis.
+    Une session relancée puis terminée à nouveau remplace l'instantané précédent."""
+    redis_client = get_redis()
+    if not redis_client:
+        return
+    key = _leaderboard_key(session_id)
+    try:
+        pairs = redis_client.zrevrange(key, 0, -1, withscores=True)
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture du classement de la session {session_id}: {str(e)}")
+        return
+    if not pairs:
+        return
+    try:
+        LeaderboardEntry.query.filter_by(session_id=session_id).delete()
+        db.session.execute(insert(LeaderboardEntry), [{
+            'session_id': int(session_id),
+            'device_id': device_id.decode('utf-8'),
+            'score': int(score),
+            'rank': rank
+        } for rank, (device_id, score) in enumerate(pairs, start=1)])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de l'enregistrement du classement de la session {session_id}: {str(e)}")
+        return
+    try:
+        redis_client.expire(key, current_app.config['LEADERBOARD_RETENTION_AFTER_END'])
+    except Exception as e:
+        logger.error(f"Erreur lors de l'expiration du classement de la session {session_id}: {str(e)}")
+
+
+def delete_leaderboard(session_id):
+    """Supprime le classement Redis (session supprimée ; l'instantané part avec la session)"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.delete(_leaderboard_key(session_id))
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression du classement de la session {session_id}: {str(e)}")
@@ -0,0 +1,189 @@
+"""Journalisation structurée et non bloquante.
+
+Les gestionnaires d'événements ne font qu'ajouter l'enregistrement à une file
+en mémoire (QueueHandler) ; un vrai thread système, hors de la boucle gevent,
+le formate en JSON et l'écrit sur stdout (QueueListener). Si la file est
+pleine, l'enregistrement est abandonné et compté plutôt que de bloquer.
+
+- LOG_LEVELS : niveaux par sous-système, ex. `engineio=WARNING,sockets=DEBUG` ;
+- LOG_SAMPLING : fraction gardée pour les journaux volumineux, ex.
+  `sockets.connections=0.01` ; chaque journal échantillonné est aussi plafonné à
+  LOG_RATE_LIMIT lignes par seconde, pour que le coût reste constant quelle que
+  soit l'audience. Les lignes gardées portent `sample_rate`.
+"""
+import atexit
+import json
+import logging
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from gevent import monkey
+from services.metrics import LOG_RECORDS_DROPPED
+
+# File et thread d'origine : l'écriture sur stdout ne doit pas bloquer la boucle gevent
+_SimpleQueue = monkey.get_original('queue', 'SimpleQueue')
+# (threading.Thread d'origine démarrerait quand même un greenlet : _start_new_thread est patché)
+_start_new_thread = monkey.get_original('_thread', 'start_new_thread')
+_allocate_lock = monkey.get_original('_thread', 'allocate_lock')
+_RLock = monkey.get_original('threading', 'RLock')
+
+# Attributs standard d'un LogRecord ; les autres viennent de `extra=` et sont sortis tels quels
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Garde une fraction des enregistrements des journaux volumineux, plafonnée par seconde.
+    Les avertissements et erreurs ne sont jamais échantillonnés."""
+
+    def __init__(self, rates, rate_limit):
+        super().__init__()
+        self.rates = rates
+        self.rate_limit = rate_limit
+        self._windows = {}
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return name, self.rates[name]
+            name = name.rpartition('.')[0]
+        return None, None
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        name, rate = self._rate(record.name)
+        if name is None:
+            return True
+        if rate < 1 and random.random() >= rate:
+            LOG_RECORDS_DROPPED.labels(reason='sampled').inc()
+            return False
+        second = int(time.monotonic())
+        window_second, count = self._windows.get(name, (second, 0))
+        if window_second != second:
+            count = 0
+        if count >= self.rate_limit:
+            LOG_RECORDS_DROPPED.labels(reason='rate_limited').inc()
+            return False
+        self._windows[name] = (second, count + 1)
+        record.sample_rate = rate
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Abandonne l'enregistrement quand la file dépasse sa taille maximale"""
+
+    def __init__(self, queue, max_size):
+        super().__init__(queue)
+        self.max_size = max_size
+
+    def prepare(self, record):
+        # Seuls le message et la trace sont figés ici ; le formatage JSON se fait dans le thread d'écriture
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            LOG_RECORDS_DROPPED.labels(reason='queue_full').inc()
+            return
+        self.queue.put_nowait(record)
+
+
+class ThreadedQueueListener(QueueListener):
+    """QueueListener sur un thread système, même quand gevent a patché threading"""
+
+    def start(self):
+        self._done = _allocate_lock()
+        self._done.acquire()
+        self._thread = _start_new_thread(self._run, ())
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._done.release()
+
+    def stop(self, timeout=5):
+        if self._thread is not None:
+            self.enqueue_sentinel()
+            self._done.acquire(timeout=timeout)
+            self._thread = None
+
+
+def _parse_pairs(value, cast):
+    pairs = {}
+    for item in (value or '').split(','):
+        name, _, setting = item.strip().partition('=')
+        if name and setting:
+            pairs[name.strip()] = cast(setting.strip())
+    return pairs
+
+
+def init_logging(app):
+    """Installe la file de journalisation sur le logger racine (idempotent)"""
+    global _listener
+    config = app.config
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(stop_logging)
+
+    stream = logging.StreamHandler(sys.stdout)
+    # Verrou natif : seul le thread d'écriture utilise ce gestionnaire
+    stream.lock = _RLock()
+    if config['LOG_FORMAT'] == 'json':
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    queue = _SimpleQueue()
+    handler = NonBlockingQueueHandler(queue, config['LOG_QUEUE_SIZE'])
+    handler.addFilter(SamplingFilter(_parse_pairs(config['LOG_SAMPLING'], float), config['LOG_RATE_LIMIT']))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if isinstance(existing, NonBlockingQueueHandler):
+            root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config['LOG_LEVEL'])
+    for name, level in _parse_pairs(config['LOG_LEVELS'], str.upper).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = ThreadedQueueListener(queue, stream)
+    _listener.start()
+
+
+def stop_logging():
+    """Vide la file avant l'arrêt du processus"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
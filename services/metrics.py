@@ -0,0 +1,112 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Diffusion groupée des résultats de quiz
+TALLY_ANSWERS = Counter(
+    'agri_tally_answers_total',
+    'Réponses aux quiz reçues par le regroupeur de diffusion'
+)
+TALLY_BROADCASTS = Counter(
+    'agri_tally_broadcasts_total',
+    'Événements quiz_tally émis vers les salles de session'
+)
+TALLY_BATCH_SIZE = Histogram(
+    'agri_tally_batch_size',
+    'Nombre de réponses regroupées dans un événement quiz_tally',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+)
+
+# Pool de workers des événements Socket.IO
+SOCKET_QUEUE_DEPTH = Gauge(
+    'agri_socket_queue_depth',
+    'Tâches Socket.IO en attente dans le pool de workers'
+)
+SOCKET_TASK_SECONDS = Histogram(
+    'agri_socket_task_seconds',
+    'Durée de traitement des tâches Socket.IO par le pool de workers',
+    ['task'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+SOCKET_TASK_WAIT_SECONDS = Histogram(
+    'agri_socket_task_wait_seconds',
+    "Temps passé par une tâche Socket.IO dans la file avant traitement",
+    ['task'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+)
+SOCKET_TASKS_REJECTED = Counter(
+    'agri_socket_tasks_rejected_total',
+    'Tâches Socket.IO refusées car la file du pool était pleine',
+    ['task']
+)
+
+# Requêtes HTTP et événements Socket.IO
+HTTP_REQUEST_SECONDS = Histogram(
+    'agri_http_request_seconds',
+    'Durée des requêtes HTTP par route',
+    ['endpoint', 'method']
+)
+HTTP_REQUESTS = Counter(
+    'agri_http_requests_total',
+    'Requêtes HTTP par route et code de statut',
+    ['endpoint', 'method', 'status']
+)
+SOCKET_EVENT_SECONDS = Histogram(
+    'agri_socket_event_seconds',
+    "Durée des gestionnaires d'événements Socket.IO",
+    ['event'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+# Base de données
+SQL_QUERY_SECONDS = Histogram(
+    'agri_sql_query_seconds',
+    'Durée des requêtes SQL',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+REQUEST_SQL_QUERIES = Histogram(
+    'agri_request_sql_queries',
+    'Nombre de requêtes SQL par requête HTTP',
+    ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+REQUEST_SQL_SECONDS = Histogram(
+    'agri_request_sql_seconds',
+    'Temps SQL cumulé par requête HTTP',
+    ['endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+
+# Redis : un aller-retour par commande isolée ou par pipeline
+REDIS_ROUNDTRIPS = Counter(
+    'agri_redis_roundtrips_total',
+    'Allers-retours Redis par commande (PIPELINE pour un pipeline entier)',
+    ['command']
+)
+REDIS_ROUNDTRIP_SECONDS = Histogram(
+    'agri_redis_roundtrip_seconds',
+    "Durée d'un aller-retour Redis",
+    ['kind'],
+    buckets=(0.0002, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+)
+
+# Diffusion Socket.IO
+ROOM_FANOUT = Histogram(
+    'agri_room_fanout',
+    'Destinataires locaux (sur ce worker) par émission Socket.IO',
+    ['event'],
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+)
+
+# Tâches de fond et planifiées
+BACKGROUND_JOB_SECONDS = Histogram(
+    'agri_background_job_seconds',
+    'Durée des tâches de fond (planificateur, flusher, échéancier, présence)',
+    ['job'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+)
+
+# Journalisation
+LOG_RECORDS_DROPPED = Counter(
+    'agri_log_records_dropped_total',
+    'Enregistrements de journal écartés (échantillonnage, plafond par seconde, file pleine)',
+    ['reason']
+)
@@ -0,0 +1,135 @@
+"""Instrumentation Prometheus des chemins chauds.
+
+Le coût par requête se limite à quelques compteurs en mémoire : les métriques
+restent activées en production. Les connexions par session sont calculées au
+moment de la collecte, depuis les salles de ce worker, sans rien ajouter aux
+chemins chauds.
+"""
+import threading
+import time
+from functools import wraps
+from flask import g, request
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from extensions import db, socketio
+from services.metrics import (
+    HTTP_REQUEST_SECONDS, HTTP_REQUESTS, SOCKET_EVENT_SECONDS, SQL_QUERY_SECONDS,
+    REQUEST_SQL_QUERIES, REQUEST_SQL_SECONDS, ROOM_FANOUT
+)
+from services.profiling import profile_scope
+from services.payloads import room_session_id
+
+# Compteurs SQL de la requête en cours (local à chaque greenlet une fois gevent patché)
+_sql = threading.local()
+
+
+def _endpoint():
+    return request.endpoint or 'inconnu'
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    _sql.count = 0
+    _sql.seconds = 0.0
+    _sql.active = True
+
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        endpoint = _endpoint()
+        HTTP_REQUEST_SECONDS.labels(endpoint=endpoint, method=request.method).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(endpoint=endpoint, method=request.method, status=response.status_code).inc()
+        REQUEST_SQL_QUERIES.labels(endpoint=endpoint).observe(_sql.count)
+        REQUEST_SQL_SECONDS.labels(endpoint=endpoint).observe(_sql.seconds)
+    _sql.active = False
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+    SQL_QUERY_SECONDS.observe(elapsed)
+    if getattr(_sql, 'active', False):
+        _sql.count += 1
+        _sql.seconds += elapsed
+
+
+def _room_size(rooms, target):
+    if isinstance(target, (list, tuple, set)):
+        return sum(len(rooms.get(room, ())) for room in target)
+    return len(rooms.get(target, ()))
+
+
+def _instrument_emit(server):
+    """Mesure la diffusion locale de chaque émission (toutes passent par server.emit)"""
+    emit = server.emit
+
+    @wraps(emit)
+    def instrumented_emit(event_name, *args, **kwargs):
+        rooms = server.manager.rooms.get(kwargs.get('namespace') or '/', {})
+        target = kwargs.get('to') or kwargs.get('room')
+        ROOM_FANOUT.labels(event=event_name).observe(_room_size(rooms, target))
+        return emit(event_name, *args, **kwargs)
+
+    server.emit = instrumented_emit
+
+
+class SessionConnectionsCollector:
+    """Connexions Socket.IO actives par salle de session sur ce worker, lues à la collecte"""
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            'agri_session_connections',
+            'Connexions Socket.IO actives par session (ce worker)',
+            labels=['session_id']
+        )
+        total = GaugeMetricFamily('agri_socket_connections', 'Connexions Socket.IO actives (ce worker)')
+        server = socketio.server
+        rooms = server.manager.rooms.get('/', {}) if server else {}
+        counts = {}
+        for room, members in list(rooms.items()):
+            session_id = room_session_id(room)
+            if session_id is not None:
+                counts[session_id] = counts.get(session_id, 0) + len(members)
+        for session_id, count in counts.items():
+            gauge.add_metric([session_id], count)
+        total.add_metric([], len(rooms.get(None, ())))
+        yield gauge
+        yield total
+
+
+_collector = None
+
+
+def track_event(name):
+    """Mesure la durée d'un gestionnaire d'événement Socket.IO (hors connect/disconnect,
+    dont Flask-SocketIO adapte l'appel à la signature) et le trace s'il est échantillonné"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with SOCKET_EVENT_SECONDS.labels(event=name).time(), profile_scope('socket', name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_monitoring(app):
+    """Branche les mesures HTTP, SQL et Socket.IO sur l'application (après socketio.init_app)"""
+    global _collector
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    if socketio.server is not None and not hasattr(socketio.server.emit, '__wrapped__'):
+        _instrument_emit(socketio.server)
+    if _collector is None:
+        _collector = SessionConnectionsCollector()
+        REGISTRY.register(_collector)
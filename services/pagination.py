@@ -0,0 +1,53 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(row):
+    raw = f"{row.timestamp.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur (timestamp, id) ; lève ValueError s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, row_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError(f"Curseur invalide: {cursor}")
+
+
+def page_size(limit):
+    """Borne la taille de page demandée"""
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def keyset_page(query, model, after=None, limit=None, descending=False):
+    """Pagine une requête sur le couple (timestamp, id) : le coût d'une page ne dépend pas
+    de sa profondeur. Retourne (lignes, curseur suivant ou None)."""
+    limit = page_size(limit)
+    if after:
+        timestamp, row_id = decode_cursor(after)
+        if descending:
+            query = query.filter(or_(
+                model.timestamp < timestamp,
+                and_(model.timestamp == timestamp, model.id < row_id)
+            ))
+        else:
+            query = query.filter(or_(
+                model.timestamp > timestamp,
+                and_(model.timestamp == timestamp, model.id > row_id)
+            ))
+    if descending:
+        query = query.order_by(model.timestamp.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.timestamp.asc(), model.id.asc())
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,108 @@
+"""Encodage des événements Socket.IO : JSON lisible ou compact, choisi par connexion.
+
+Un client demande le mode compact à la connexion (`io(url, {query: {compact: 1}})`) ;
+il rejoint alors `compact_session_{id}` au lieu de `session_{id}`. Les émissions
+vers une session passent par `emit_to_session(s)`, qui envoie à chaque salle son
+encodage :
+- lisible : clés complètes, dates ISO 8601 ;
+- compact : clés courtes (SHORT_KEYS) et dates en secondes epoch (les `datetime`
+  naïfs du projet, issus de `datetime.utcnow()`, sont lus en UTC).
+
+Les charges utiles sont construites avec des `datetime` ; l'encodage les
+convertit. Le sérialiseur msgpack de Socket.IO n'est pas utilisé : il vaut
+pour tout le serveur et ne peut pas se négocier par connexion.
+"""
+import json
+from datetime import datetime, timezone
+from flask import request
+from extensions import socketio
+
+SESSION_ROOM = "session_{session_id}"
+COMPACT_ROOM = "compact_session_{session_id}"
+
+# Schéma compact, partagé avec expandPayload() de templates/hbbtv_index.html
+SHORT_KEYS = {
+    'session_id': 's',
+    'session_ids': 'ss',
+    'status': 'st',
+    'message': 'm',
+    'id': 'i',
+    'question_id': 'qi',
+    'question_text': 'qt',
+    'answer_text': 'at',
+    'question': 'q',
+    'options': 'o',
+    'timestamp': 'ts',
+    'quiz_id': 'z',
+    'results': 'r',
+    'total_responses': 'n',
+    'questions': 'qs',
+    'quizzes': 'zs',
+    'top': 'tp',
+    'rank': 'k',
+    'player': 'p',
+    'score': 'sc'
+}
+
+
+def session_room(session_id):
+    return SESSION_ROOM.format(session_id=int(session_id))
+
+
+def compact_room(session_id):
+    return COMPACT_ROOM.format(session_id=int(session_id))
+
+
+def room_session_id(room):
+    """Session d'une salle (lisible ou compacte) ; None pour les autres salles"""
+    if not isinstance(room, str):
+        return None
+    for template in (SESSION_ROOM, COMPACT_ROOM):
+        prefix = template.split('{', 1)[0]
+        if room.startswith(prefix) and room[len(prefix):].isdigit():
+            return room[len(prefix):]
+    return None
+
+
+def wants_compact():
+    """Mode demandé par la connexion Socket.IO en cours (paramètre de la requête de connexion)"""
+    return request.args.get('compact') in ('1', 'true')
+
+
+def epoch(value):
+    """Secondes epoch d'un datetime ; un datetime naïf est en UTC (utcnow), pas en heure locale"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def encode(value, compact=False):
+    if isinstance(value, dict):
+        if compact:
+            return {SHORT_KEYS.get(key, key): encode(item, True) for key, item in value.items()}
+        return {key: encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item, compact) for item in value]
+    if isinstance(value, datetime):
+        return epoch(value) if compact else value.isoformat()
+    return value
+
+
+def dumps(payload, compact=False):
+    """Sérialise une charge utile (snapshots pré-sérialisés mis en cache)"""
+    return json.dumps(encode(payload, compact), separators=(',', ':'))
+
+
+def emit_to_sessions(event, payload, session_ids):
+    """Émet un événement vers les salles lisibles puis compactes de plusieurs sessions"""
+    session_ids = list(session_ids)
+    socketio.emit(event, encode(payload), to=[session_room(session_id) for session_id in session_ids])
+    socketio.emit(event, encode(payload, True), to=[compact_room(session_id) for session_id in session_ids])
+
+
+def emit_to_session(event, payload, session_id):
+    emit_to_sessions(event, payload, [session_id])
+
+
+def emit_to_sid(event, payload, sid, compact=False):
+    socketio.emit(event, encode(payload, compact), to=sid)
@@ -0,0 +1,241 @@
+"""Profilage par requête : SQL, rendu des templates et profil Python échantillonnés.
+
+Une trace est ouverte pour une fraction PROFILE_SAMPLE_RATE des requêtes HTTP
+et des événements Socket.IO, ou à la demande d'un administrateur avec
+`?_profile=1`. Elle enregistre chaque requête SQL (texte, durée, site
+d'appel dans le code de l'application), le temps de rendu des templates, les
+motifs N+1 (même requête répétée au moins PROFILE_N_PLUS_ONE fois) et, si
+PROFILE_PYTHON est activé, les fonctions les plus coûteuses selon cProfile.
+
+Les traces compactes sont gardées dans une liste Redis plafonnée à
+PROFILE_MAX_TRACES et consultables dans /admin/traces. Hors trace, le coût se
+limite à un tirage aléatoire par requête.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, request, template_rendered, before_render_template
+from flask_login import current_user
+from sqlalchemy import event
+from extensions import db, get_redis
+
+logger = logging.getLogger(__name__)
+
+TRACES_KEY = "profiling:traces"
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_STATEMENT_LENGTH = 500
+
+# Trace en cours (locale à chaque greenlet une fois gevent patché)
+_current = threading.local()
+# cProfile n'accepte qu'un profileur actif par processus : les autres traces s'en passent
+_profiler_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, kind, name, python_profile):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.statements = []
+        self.template_ms = 0.0
+        self._template_start = None
+        self.profiler = None
+        if python_profile and _profiler_lock.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def add_statement(self, statement, duration, site):
+        self.statements.append((statement, duration, site))
+
+    def finish(self, status=None):
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        if self.profiler:
+            self.profiler.disable()
+            _profiler_lock.release()
+        threshold = current_app.config['PROFILE_N_PLUS_ONE']
+        groups = {}
+        for statement, duration, site in self.statements:
+            group = groups.setdefault(statement, {'count': 0, 'total_ms': 0.0, 'sites': set()})
+            group['count'] += 1
+            group['total_ms'] += duration * 1000
+            group['sites'].add(site)
+        sql_ms = sum(duration for _, duration, _ in self.statements) * 1000
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'status': status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(duration_ms, 2),
+            'sql_ms': round(sql_ms, 2),
+            'template_ms': round(self.template_ms, 2),
+            'query_count': len(self.statements),
+            'statements': [{
+                'sql': statement[:MAX_STATEMENT_LENGTH],
+                'ms': round(duration * 1000, 3),
+                'site': site
+            } for statement, duration, site in self.statements],
+            'n_plus_one': [{
+                'sql': statement[:MAX_STATEMENT_LENGTH],
+                'count': group['count'],
+                'total_ms': round(group['total_ms'], 2),
+                'sites': sorted(group['sites'])
+            } for statement, group in groups.items() if group['count'] >= threshold],
+            'python': self._python_summary()
+        }
+
+    def _python_summary(self, limit=25):
+        if not self.profiler:
+            return []
+        stats = pstats.Stats(self.profiler)
+        rows = []
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': f"{os.path.relpath(filename, APP_ROOT) if filename.startswith(APP_ROOT) else filename}:{line}({function})",
+                'calls': calls,
+                'tottime_ms': round(tottime * 1000, 3),
+                'cumtime_ms': round(cumtime * 1000, 3)
+            })
+        rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+        return rows[:limit]
+
+
+def _call_site():
+    """Premier cadre de la pile appartenant au code de l'application (hors ce module)"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_ROOT) and filename != __file__ and '/site-packages/' not in filename:
+            return f"{os.path.relpath(filename, APP_ROOT)}:{frame.f_lineno}({frame.f_code.co_name})"
+        frame = frame.f_back
+    return '?'
+
+
+def _should_trace():
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+def start_trace(kind, name, force=False):
+    if getattr(_current, 'trace', None) is not None:
+        return None
+    if not (force or _should_trace()):
+        return None
+    _current.trace = Trace(kind, name, current_app.config['PROFILE_PYTHON'])
+    return _current.trace
+
+
+def finish_trace(status=None):
+    trace = getattr(_current, 'trace', None)
+    if trace is None:
+        return None
+    _current.trace = None
+    try:
+        data = trace.finish(status)
+        store_trace(data)
+        if data['n_plus_one']:
+            logger.warning(f"Motif N+1 dans {data['name']} : "
+                           f"{', '.join(str(group['count']) + 'x ' + group['sites'][0] for group in data['n_plus_one'])}")
+        return data
+    except Exception as e:
+        logger.error(f"Erreur lors de l'enregistrement de la trace {trace.id}: {str(e)}")
+        return None
+
+
+def store_trace(data):
+    redis_client = get_redis()
+    if not redis_client:
+        return
+    pipe = redis_client.pipeline()
+    pipe.lpush(TRACES_KEY, json.dumps(data, separators=(',', ':')))
+    pipe.ltrim(TRACES_KEY, 0, current_app.config['PROFILE_MAX_TRACES'] - 1)
+    pipe.execute()
+
+
+def list_traces():
+    """Traces récentes, de la plus récente à la plus ancienne"""
+    redis_client = get_redis()
+    if not redis_client:
+        return []
+    return [json.loads(raw) for raw in redis_client.lrange(TRACES_KEY, 0, -1)]
+
+
+def get_trace(trace_id):
+    for trace in list_traces():
+        if trace['id'] == trace_id:
+            return trace
+    return None
+
+
+@contextmanager
+def profile_scope(kind, name):
+    """Trace un bloc (gestionnaire Socket.IO) s'il est tiré au sort"""
+    trace = start_trace(kind, name)
+    if trace is None:
+        yield
+        return
+    try:
+        yield
+    except Exception:
+        finish_trace('error')
+        raise
+    finish_trace('ok')
+
+
+def _before_request():
+    force = request.args.get('_profile') == '1' and current_user.is_authenticated and current_user.role == 'admin'
+    start_trace('http', f"{request.method} {request.endpoint or request.path}", force=force)
+
+
+def _teardown_request(exc):
+    if getattr(_current, 'trace', None) is not None:
+        finish_trace('error' if exc else 'ok')
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_current, 'trace', None)
+    if trace is not None:
+        started = conn.info.get('profile_query_start')
+        duration = time.perf_counter() - started if started else 0.0
+        trace.add_statement(statement, duration, _call_site())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_current, 'trace', None) is not None:
+        conn.info['profile_query_start'] = time.perf_counter()
+
+
+def _before_render(sender, template, context, **extra):
+    trace = getattr(_current, 'trace', None)
+    if trace is not None:
+        trace._template_start = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    trace = getattr(_current, 'trace', None)
+    if trace is not None and trace._template_start is not None:
+        trace.template_ms += (time.perf_counter() - trace._template_start) * 1000
+        trace._template_start = None
+
+
+def init_profiling(app):
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'after_cursor_execute', _after_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
@@ -0,0 +1,73 @@
+import logging
+import math
+from flask import current_app
+from extensions import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Seaux à jetons vérifiés et débités atomiquement : la requête n'est acceptée que si
+# tous les seaux (appareil, session) ont un jeton. ARGV = couples (débit/s, capacité).
+# Retourne 0 si accepté, sinon le délai d'attente en millisecondes.
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1]) / 1000
+    local capacity = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, math.ceil((1 - tokens) / rate))
+    end
+end
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    local rate = tonumber(ARGV[i * 2 - 1]) / 1000
+    local capacity = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate) + 1000)
+end
+return wait
+"""
+
+_bucket_script = None
+
+
+def _script(redis_client):
+    global _bucket_script
+    if _bucket_script is None:
+        _bucket_script = redis_client.register_script(TOKEN_BUCKET_LUA)
+    return _bucket_script
+
+
+def check_question_rate(session_id, client_id):
+    """Consomme un jeton pour une question. Retourne (accepté, délai d'attente en secondes).
+    Sans Redis, la limite n'est pas appliquée."""
+    redis_client = get_redis()
+    if not redis_client:
+        return True, 0
+    config = current_app.config
+    keys = [
+        f"ratelimit:question:session:{session_id}:client:{client_id}",
+        f"ratelimit:question:session:{session_id}"
+    ]
+    args = [
+        config['QUESTION_CLIENT_RATE_PER_MIN'] / 60.0, config['QUESTION_CLIENT_BURST'],
+        config['QUESTION_SESSION_RATE_PER_MIN'] / 60.0, config['QUESTION_SESSION_BURST']
+    ]
+    try:
+        wait_ms = _script(redis_client)(keys=keys, args=args)
+    except Exception as e:
+        logger.error(f"Erreur lors de la limitation de débit des questions (session {session_id}): {str(e)}")
+        return True, 0
+    if wait_ms:
+        return False, math.ceil(int(wait_ms) / 1000)
+    return True, 0
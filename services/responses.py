@@ -0,0 +1,305 @@
+"""Ingestion des réponses aux quiz en écriture différée (write-behind).
+
+Les réponses sont ajoutées à un stream Redis puis insérées par lots dans
+`QuizResponse` par un flusher en arrière-plan (déclenché par taille de lot
+ou par délai).
+
+Garanties de durabilité :
+- une réponse est acquittée au client dès que XADD a réussi ; elle survit
+  alors à un redémarrage du worker, et à un redémarrage de Redis selon sa
+  persistance (AOF recommandé) ;
+- les entrées ne sont XACK/XDEL qu'après le commit SQL du lot : un crash
+  entre les deux provoque une nouvelle livraison (au moins une fois) ;
+- les entrées restées en attente sur un consommateur mort sont reprises
+  par XAUTOCLAIM après RESPONSE_CLAIM_IDLE_MS ;
+- si Redis est indisponible, la réponse est écrite de façon synchrone ;
+- une réponse n'est acceptée que pour un quiz existant de la session et une
+  option du quiz (check_response, avant toute réservation ou écriture) ;
+- un appareil ne répond qu'une fois par quiz : SADD atomique dans Redis
+  (première réponse gagnante), doublé de l'index unique (quiz_id, device_id)
+  et d'un INSERT ... IGNORE qui rend les relivraisons idempotentes ;
+- à l'arrêt du worker (hook worker_exit de gunicorn.conf.py), le flusher vide
+  ce qui reste avant de rendre la main.
+"""
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from extensions import db, socketio, get_redis
+from models import QuizResponse
+from services.tallies import queue_increment
+from services.transcript import record_quiz_answer
+from services.metrics import BACKGROUND_JOB_SECONDS
+from services.analytics import record_responses
+from services.leaderboard import MISSING_META, queue_score, score_from_db, quiz_meta
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_STREAM = "quiz_responses:stream"
+RESPONSE_GROUP = "quiz_responses:flushers"
+ANSWERED_KEY = "quiz:{quiz_id}:devices"
+POLL_INTERVAL = 0.05
+
+
+def _response_row(fields):
+    """Convertit une entrée du stream en ligne QuizResponse"""
+    fields = {k.decode('utf-8'): v.decode('utf-8') for k, v in fields.items()}
+    return {
+        'quiz_id': int(fields['quiz_id']),
+        'user_id': int(fields['user_id']) if fields.get('user_id') else None,
+        'device_id': fields.get('device_id') or None,
+        'selected_option': int(fields['selected_option']),
+        'timestamp': datetime.fromisoformat(fields['timestamp'])
+    }
+
+
+def response_backlog(redis_client):
+    """Nombre de réponses encore dans le stream (non insérées en base)"""
+    return redis_client.xlen(RESPONSE_STREAM)
+
+
+def check_response(session_id, quiz_id, selected_option):
+    """Vérifie une réponse avant de la réserver ; retourne les métadonnées du quiz.
+    LookupError si le quiz n'existe pas dans cette session, ValueError si l'option n'existe pas."""
+    meta = quiz_meta(quiz_id)
+    if meta is None or (session_id is not None and meta['session_id'] != int(session_id)):
+        raise LookupError("Quiz introuvable dans cette session")
+    if isinstance(selected_option, bool) or not isinstance(selected_option, int) \
+            or not 0 <= selected_option < meta['options']:
+        raise ValueError("Option de réponse invalide")
+    return meta
+
+
+def claim_answer(quiz_id, device_id):
+    """Réserve la réponse d'un appareil à un quiz. Retourne False si l'appareil a déjà répondu."""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            key = ANSWERED_KEY.format(quiz_id=int(quiz_id))
+            pipe = redis_client.pipeline()
+            pipe.sadd(key, device_id)
+            pipe.expire(key, current_app.config['ANSWER_GUARD_TTL'], nx=True)
+            added, _ = pipe.execute()
+            return added == 1
+        except Exception as e:
+            logger.error(f"Erreur lors de la vérification de réponse unique au quiz {quiz_id}: {str(e)}")
+    return QuizResponse.query.filter_by(quiz_id=quiz_id, device_id=device_id).first() is None
+
+
+def release_answer(quiz_id, device_id):
+    """Libère la réservation si la réponse n'a finalement pas pu être enregistrée"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.srem(ANSWERED_KEY.format(quiz_id=int(quiz_id)), device_id)
+        except Exception as e:
+            logger.error(f"Erreur lors de la libération de la réponse au quiz {quiz_id}: {str(e)}")
+
+
+def _insert_ignore():
+    """INSERT qui ignore les doublons (quiz_id, device_id) selon le dialecte de la base"""
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        return insert(QuizResponse).prefix_with('IGNORE')
+    if dialect == 'sqlite':
+        return insert(QuizResponse).prefix_with('OR IGNORE')
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(QuizResponse).on_conflict_do_nothing()
+    return insert(QuizResponse)
+
+
+def enqueue_response(quiz_id, selected_option, device_id=None, user_id=None, session_id=None):
+    """Met une réponse en file pour insertion différée (synchrone si Redis est indisponible).
+    Stream, compteurs, transcript et classement de la session partent dans un seul pipeline."""
+    timestamp = datetime.now()
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.xadd(RESPONSE_STREAM, {
+                'quiz_id': quiz_id,
+                'selected_option': selected_option,
+                'device_id': device_id or '',
+                'user_id': user_id or '',
+                'timestamp': timestamp.isoformat()
+            })
+            queue_increment(redis_client, pipe, quiz_id, selected_option)
+            if session_id is not None:
+                record_quiz_answer(pipe, session_id, quiz_id, selected_option, timestamp)
+            scored = session_id is not None and bool(device_id)
+            if scored:
+                queue_score(redis_client, pipe, session_id, quiz_id, device_id, selected_option, timestamp)
+            added, *side_writes = pipe.execute(raise_on_error=False)
+            if isinstance(added, Exception):
+                raise added
+            for result in side_writes:
+                if isinstance(result, Exception):
+                    logger.error(f"Erreur lors de la mise à jour Redis de la réponse au quiz {quiz_id}: {str(result)}")
+            if scored and side_writes[-1] == MISSING_META:
+                try:
+                    score_from_db(redis_client, session_id, quiz_id, device_id, selected_option, timestamp)
+                except Exception as e:
+                    logger.error(f"Erreur lors du calcul du score de la réponse au quiz {quiz_id}: {str(e)}")
+            return
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise en file de la réponse au quiz {quiz_id}: {str(e)}")
+
+    row = {
+        'quiz_id': quiz_id,
+        'user_id': user_id,
+        'device_id': device_id,
+        'selected_option': selected_option,
+        'timestamp': timestamp
+    }
+    db.session.add(QuizResponse(**row))
+    db.session.flush()
+    record_responses([row])
+    db.session.commit()
+
+
+def submit_response(quiz_id, selected_option, device_id=None, user_id=None, session_id=None):
+    """Enregistre une réponse (une seule par appareil et par quiz).
+    Retourne False si cet appareil a déjà répondu, sinon les métadonnées du quiz (voir check_response,
+    dont les exceptions sont propagées)."""
+    meta = check_response(session_id, quiz_id, selected_option)
+    if device_id and not claim_answer(quiz_id, device_id):
+        return False
+    try:
+        enqueue_response(quiz_id, selected_option, device_id=device_id, user_id=user_id, session_id=session_id)
+    except IntegrityError:
+        # Écriture synchrone (Redis indisponible) : réponse concurrente du même appareil
+        db.session.rollback()
+        return False
+    except Exception:
+        if device_id:
+            release_answer(quiz_id, device_id)
+        raise
+    return meta
+
+
+class ResponseFlusher:
+    """Consomme le stream des réponses et les insère par lots dans la base"""
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config['RESPONSE_FLUSH_BATCH']
+        self.interval = app.config['RESPONSE_FLUSH_INTERVAL_MS'] / 1000.0
+        self.claim_idle_ms = app.config['RESPONSE_CLAIM_IDLE_MS']
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._running = False
+        self._task = None
+        self._last_claim = 0.0
+
+    def start(self):
+        redis_client = get_redis()
+        if not redis_client:
+            logger.warning("Redis indisponible : les réponses aux quiz seront écrites de façon synchrone")
+            return
+        try:
+            redis_client.xgroup_create(RESPONSE_STREAM, RESPONSE_GROUP, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._running = True
+        self._task = socketio.start_background_task(self._run)
+
+    def stop(self):
+        """Arrête la boucle et vide ce qui reste dans le stream pour ce consommateur"""
+        if not self._running:
+            return
+        self._running = False
+        # Laisse la boucle terminer le lot en cours, sinon ses entrées attendraient XAUTOCLAIM
+        self._task.join(timeout=self.interval * 5)
+        try:
+            while self.flush_once(block=False):
+                pass
+        except Exception as e:
+            logger.error(f"Erreur lors du vidage final des réponses: {str(e)}")
+
+    def _run(self):
+        while self._running:
+            try:
+                self.flush_once()
+            except Exception as e:
+                logger.error(f"Erreur dans le flusher des réponses: {str(e)}")
+                time.sleep(self.interval)
+
+    def _claim_stale(self, redis_client):
+        """Reprend les entrées en attente depuis trop longtemps (consommateur mort ou lot en échec)"""
+        now = time.monotonic()
+        if now - self._last_claim < self.claim_idle_ms / 1000.0:
+            return []
+        self._last_claim = now
+        result = redis_client.xautoclaim(
+            RESPONSE_STREAM, RESPONSE_GROUP, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id='0-0', count=self.batch_size
+        )
+        return result[1]
+
+    def flush_once(self, block=True):
+        """Accumule jusqu'à batch_size entrées ou jusqu'au délai, puis écrit le lot.
+        Retourne le nombre d'entrées traitées."""
+        redis_client = get_redis()
+        batch = self._claim_stale(redis_client)
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            # Lectures non bloquantes + sleep : coopératif avec gevent quel que soit le client Redis
+            result = redis_client.xreadgroup(
+                RESPONSE_GROUP, self.consumer, {RESPONSE_STREAM: '>'},
+                count=self.batch_size - len(batch)
+            )
+            if result and result[0][1]:
+                batch.extend(result[0][1])
+                continue
+            remaining = deadline - time.monotonic()
+            if not block or remaining <= 0:
+                break
+            time.sleep(min(remaining, POLL_INTERVAL))
+        if not batch:
+            return 0
+        with BACKGROUND_JOB_SECONDS.labels(job='response_flush').time():
+            return self._write(redis_client, batch)
+
+    def _write(self, redis_client, batch):
+        ids = [entry_id for entry_id, _ in batch]
+        rows = [_response_row(fields) for _, fields in batch]
+        with self.app.app_context():
+            try:
+                # Exécution Core sur la connexion de la session : même transaction, et rowcount disponible
+                inserted = db.session.connection().execute(_insert_ignore(), rows).rowcount
+                # Statistiques dans la même transaction ; recalcul si des doublons ont été ignorés
+                record_responses(rows, all_inserted=inserted == len(rows))
+                db.session.commit()
+            except IntegrityError as e:
+                db.session.rollback()
+                logger.error(f"Échec de l'insertion groupée de {len(rows)} réponses, repli ligne par ligne: {str(e)}")
+                rows = self._write_one_by_one(rows)
+            except Exception:
+                # Base indisponible : le lot reste en attente et sera repris par XAUTOCLAIM
+                db.session.rollback()
+                raise
+        pipe = redis_client.pipeline()
+        pipe.xack(RESPONSE_STREAM, RESPONSE_GROUP, *ids)
+        pipe.xdel(RESPONSE_STREAM, *ids)
+        pipe.execute()
+        return len(ids)
+
+    def _write_one_by_one(self, rows):
+        """Insère les lignes une à une ; les lignes invalides (quiz supprimé...) sont écartées"""
+        written = []
+        for row in rows:
+            try:
+                inserted = db.session.connection().execute(_insert_ignore(), [row]).rowcount
+                if inserted:
+                    record_responses([row])
+                db.session.commit()
+                written.append(row)
+            except IntegrityError as e:
+                db.session.rollback()
+                logger.error(f"Réponse écartée pour le quiz {row['quiz_id']}: {str(e)}")
+        return written
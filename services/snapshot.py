@@ -0,0 +1,122 @@
+"""Snapshot (questions + quiz) envoyé à chaque spectateur qui rejoint une session.
+
+Les écritures ne reconstruisent pas le snapshot : elles suppriment les deux
+encodages en cache et incrémentent `session:{id}:snapshot:version`, dans le
+pipeline de l'écriture. La première lecture suivante le reconstruit depuis la
+base et ne le remet en cache que si la version n'a pas changé pendant la
+construction : une construction plus ancienne ne remplace jamais une plus récente.
+"""
+import logging
+from flask import current_app
+from extensions import get_redis
+from models import Question, Quiz
+from services.payloads import dumps
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "session:{session_id}:snapshot"
+COMPACT_SNAPSHOT_KEY = "session:{session_id}:snapshot:compact"
+SNAPSHOT_VERSION_KEY = "session:{session_id}:snapshot:version"
+
+# Met le snapshot en cache seulement si aucune écriture n'a eu lieu depuis la lecture de la version
+STORE_LUA = """
+local version = redis.call('GET', KEYS[3]) or '0'
+if version ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[4])
+redis.call('SET', KEYS[2], ARGV[3], 'EX', ARGV[4])
+return 1
+"""
+
+_store_script = None
+
+
+def _snapshot_key(session_id, compact=False):
+    return (COMPACT_SNAPSHOT_KEY if compact else SNAPSHOT_KEY).format(session_id=int(session_id))
+
+
+def _version_key(session_id):
+    return SNAPSHOT_VERSION_KEY.format(session_id=int(session_id))
+
+
+def build_snapshot(session_id):
+    """Construit le snapshot (questions + quiz) d'une session depuis la base, dates non sérialisées"""
+    session_id = int(session_id)
+    questions = Question.query.filter_by(session_id=session_id).order_by(Question.timestamp.asc()).all()
+    quizzes = Quiz.query.filter_by(session_id=session_id).order_by(Quiz.timestamp.desc()).all()
+    return {
+        'session_id': session_id,
+        'questions': [{
+            'question_id': question.id,
+            'question_text': question.question_text,
+            'answer_text': question.answer_text,
+            'timestamp': question.timestamp
+        } for question in questions],
+        'quizzes': [{
+            'id': quiz.id,
+            'question': quiz.question,
+            'options': quiz.options,
+            'timestamp': quiz.timestamp
+        } for quiz in quizzes]
+    }
+
+
+def _cache_snapshot(redis_client, session_id, version, payloads):
+    global _store_script
+    if _store_script is None:
+        _store_script = redis_client.register_script(STORE_LUA)
+    _store_script(
+        keys=[_snapshot_key(session_id), _snapshot_key(session_id, compact=True), _version_key(session_id)],
+        args=[version, payloads[0], payloads[1], current_app.config['SNAPSHOT_TTL']]
+    )
+
+
+def get_snapshot(session_id, compact=False):
+    """Retourne le snapshot JSON d'une session dans l'encodage demandé : une lecture Redis,
+    la base seulement si le cache est vide (première lecture après une écriture)"""
+    redis_client = get_redis()
+    version = None
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(_snapshot_key(session_id, compact))
+            pipe.get(_version_key(session_id))
+            payload, version = pipe.execute()
+            if payload is not None:
+                return payload.decode('utf-8')
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture du snapshot de la session {session_id}: {str(e)}")
+            redis_client = None
+
+    snapshot = build_snapshot(session_id)
+    payloads = (dumps(snapshot), dumps(snapshot, compact=True))
+    if redis_client:
+        try:
+            _cache_snapshot(redis_client, session_id, version or b'0', payloads)
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise en cache du snapshot de la session {session_id}: {str(e)}")
+    return payloads[1 if compact else 0]
+
+
+def _queue_invalidation(pipe, session_id):
+    pipe.delete(_snapshot_key(session_id), _snapshot_key(session_id, compact=True))
+    pipe.incr(_version_key(session_id))
+    pipe.expire(_version_key(session_id), current_app.config['SNAPSHOT_TTL'])
+
+
+def invalidate_snapshot(session_id, pipe=None):
+    """Supprime le snapshot en cache. À appeler après chaque écriture d'une question, d'une
+    réponse ou d'un quiz (et à la suppression de la session) ; avec `pipe`, dans le pipeline
+    de l'appelant. Le snapshot est reconstruit à la lecture suivante."""
+    if pipe is not None:
+        _queue_invalidation(pipe, session_id)
+        return
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            _queue_invalidation(pipe, session_id)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Erreur lors de l'invalidation du snapshot de la session {session_id}: {str(e)}")
@@ -0,0 +1,151 @@
+import logging
+import time
+from datetime import datetime
+from flask import current_app
+from extensions import db, get_redis
+from models import Session
+from services.current_session import invalidate_current_session, is_session_live
+from services.expiry import schedule_session_end, unschedule_session
+from services.transcript import close_transcript
+from services.leaderboard import snapshot_leaderboard
+from services.payloads import emit_to_session
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEYS_KEY = "sessions:stream_keys"
+# Fins de diffusion en attente : session -> échéance du délai de grâce (epoch)
+STREAM_DOWN_KEY = "sessions:stream_down"
+
+
+def index_stream_key(session):
+    """Associe la clé de diffusion à sa session (la correspondance ne change jamais)"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.hset(STREAM_KEYS_KEY, session.stream_key, session.id)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'indexation de la clé de diffusion de la session {session.id}: {str(e)}")
+
+
+def unindex_stream_key(stream_key):
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.hdel(STREAM_KEYS_KEY, stream_key)
+        except Exception as e:
+            logger.error(f"Erreur lors de la désindexation de la clé de diffusion {stream_key}: {str(e)}")
+
+
+def lookup_session_id(stream_key):
+    """Retrouve la session d'une clé de diffusion : index Redis, puis base (et remise en index)"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            session_id = redis_client.hget(STREAM_KEYS_KEY, stream_key)
+            if session_id is not None:
+                return int(session_id)
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture de l'index des clés de diffusion: {str(e)}")
+    row = Session.query.with_entities(Session.id).filter_by(stream_key=stream_key).first()
+    if row is None:
+        return None
+    if redis_client:
+        try:
+            redis_client.hset(STREAM_KEYS_KEY, stream_key, row.id)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'indexation de la clé de diffusion {stream_key}: {str(e)}")
+    return row.id
+
+
+def _notify(session_id, status):
+    emit_to_session('session_status_changed', {
+        'session_id': session_id,
+        'status': status
+    }, session_id)
+
+
+def mark_stream_live(session_id):
+    """Passe en direct une session programmée, en une seule requête, si son horaire n'est pas échu.
+    Une republication pendant le délai de grâce reprend la session en direct ; une session
+    terminée (arrêtée, échue ou coupée) n'est jamais rouverte. Retourne False si la
+    diffusion doit être refusée."""
+    now = datetime.utcnow()
+    updated = Session.query.filter(
+        Session.id == session_id,
+        Session.status == 'scheduled',
+        Session.end_time > now
+    ).update({'status': 'live'}, synchronize_session=False)
+    db.session.commit()
+    if updated:
+        logger.info(f"Session {session_id} passée en direct par SRS")
+        invalidate_current_session()
+        session = db.session.get(Session, session_id)
+        schedule_session_end(session)
+        _notify(session_id, 'live')
+        return True
+    if not is_session_live(session_id):
+        return False
+    # Déjà en direct : reconnexion de l'encodeur, la fin en attente est annulée
+    cancel_stream_end(session_id)
+    return True
+
+
+def mark_stream_ended(session_id):
+    """Termine la session en une seule requête quand la diffusion est arrêtée pour de bon"""
+    updated = Session.query.filter(
+        Session.id == session_id,
+        Session.status == 'live'
+    ).update({'status': 'ended'}, synchronize_session=False)
+    db.session.commit()
+    if updated:
+        logger.info(f"Session {session_id} terminée par SRS (fin de diffusion)")
+        invalidate_current_session()
+        unschedule_session(session_id)
+        close_transcript(session_id)
+        snapshot_leaderboard(session_id)
+        _notify(session_id, 'ended')
+    return bool(updated)
+
+
+def schedule_stream_end(session_id):
+    """Diffère la fin de la session de SRS_UNPUBLISH_GRACE secondes (coupure réseau de l'encodeur).
+    Sans Redis ou sans délai, la session est terminée tout de suite."""
+    grace = current_app.config['SRS_UNPUBLISH_GRACE']
+    redis_client = get_redis()
+    if redis_client and grace > 0:
+        try:
+            redis_client.zadd(STREAM_DOWN_KEY, {str(session_id): time.time() + grace})
+            logger.info(f"Fin de diffusion de la session {session_id} : terminaison dans {grace}s sans republication")
+            return
+        except Exception as e:
+            logger.error(f"Erreur lors de la planification de la fin de diffusion de la session {session_id}: {str(e)}")
+    mark_stream_ended(session_id)
+
+
+def cancel_stream_end(session_id):
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.zrem(STREAM_DOWN_KEY, str(session_id))
+        except Exception as e:
+            logger.error(f"Erreur lors de l'annulation de la fin de diffusion de la session {session_id}: {str(e)}")
+
+
+def end_dropped_streams(now=None):
+    """Termine les sessions dont la diffusion n'a pas repris à la fin du délai de grâce.
+    Retourne la liste des sessions terminées."""
+    redis_client = get_redis()
+    now = now or time.time()
+    due = redis_client.zrangebyscore(STREAM_DOWN_KEY, '-inf', now)
+    ended = []
+    for member in due:
+        # ZREM sert de réservation : une republication concurrente a déjà retiré l'entrée
+        if redis_client.zrem(STREAM_DOWN_KEY, member) and mark_stream_ended(int(member)):
+            ended.append(int(member))
+    return ended
+
+
+def next_stream_end():
+    """Échéance (epoch) de la prochaine fin de diffusion en attente, ou None"""
+    upcoming = get_redis().zrange(STREAM_DOWN_KEY, 0, 0, withscores=True)
+    return upcoming[0][1] if upcoming else None
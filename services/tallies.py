@@ -0,0 +1,158 @@
+import logging
+from flask import current_app
+from sqlalchemy import func
+from extensions import db, get_redis
+from models import Quiz, QuizResponse, QuizStats, Session
+
+logger = logging.getLogger(__name__)
+
+TALLY_KEY = "quiz:{quiz_id}:tally"
+
+# N'incrémente que si le champ de l'option existe : un hash partiel fausserait les résultats
+# (un compteur absent est reconstruit depuis la base à la lecture suivante) et une option
+# hors limites ne doit pas créer de champ.
+INCREMENT_LUA = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    return redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+end
+return nil
+"""
+
+_increment_script = None
+
+
+def _tally_key(quiz_id):
+    return TALLY_KEY.format(quiz_id=int(quiz_id))
+
+
+def _script(redis_client):
+    global _increment_script
+    if _increment_script is None:
+        _increment_script = redis_client.register_script(INCREMENT_LUA)
+    return _increment_script
+
+
+def queue_increment(redis_client, pipe, quiz_id, selected_option):
+    """Ajoute l'incrément du compteur à un pipeline (même aller-retour que l'ingestion)"""
+    _script(redis_client)(keys=[_tally_key(quiz_id)], args=[int(selected_option)], client=pipe)
+
+
+def init_tally(quiz, pipe=None):
+    """Crée les compteurs à zéro pour un nouveau quiz"""
+    store_tally(quiz.id, [0] * len(quiz.options), pipe=pipe)
+
+
+def _queue_store(pipe, quiz_id, counts):
+    key = _tally_key(quiz_id)
+    pipe.delete(key)
+    pipe.hset(key, mapping={str(i): count for i, count in enumerate(counts)})
+    pipe.expire(key, current_app.config['TALLY_TTL'])
+
+
+def store_tally(quiz_id, counts, pipe=None):
+    if pipe is not None:
+        _queue_store(pipe, quiz_id, counts)
+        return
+    redis_client = get_redis()
+    if not redis_client:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        _queue_store(pipe, quiz_id, counts)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Erreur lors de l'écriture des compteurs du quiz {quiz_id}: {str(e)}")
+
+
+def delete_tally(quiz_id, pipe=None):
+    if pipe is not None:
+        pipe.delete(_tally_key(quiz_id))
+        return
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.delete(_tally_key(quiz_id))
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression des compteurs du quiz {quiz_id}: {str(e)}")
+
+
+def count_from_db(quiz_ids):
+    """Compte les réponses par option pour plusieurs quiz en une seule requête GROUP BY"""
+    rows = db.session.query(
+        QuizResponse.quiz_id,
+        QuizResponse.selected_option,
+        func.count(QuizResponse.id)
+    ).filter(QuizResponse.quiz_id.in_(quiz_ids)).group_by(
+        QuizResponse.quiz_id, QuizResponse.selected_option
+    ).all()
+    counts = {}
+    for quiz_id, selected_option, count in rows:
+        counts.setdefault(quiz_id, {})[selected_option] = count
+    return counts
+
+
+def count_from_stats(quiz_ids):
+    """Même résultat que count_from_db, lu dans QuizStats : une ligne par quiz au lieu d'un parcours des réponses"""
+    rows = db.session.query(QuizStats.quiz_id, QuizStats.option_counts).filter(QuizStats.quiz_id.in_(quiz_ids)).all()
+    return {quiz_id: {option: count for option, count in enumerate(option_counts) if count}
+            for quiz_id, option_counts in rows}
+
+
+def _backlog_empty(redis_client):
+    # Les réponses encore dans le stream sont déjà comptées dans Redis mais pas en base
+    from services.responses import response_backlog
+    return response_backlog(redis_client) == 0
+
+
+def read_tally(quiz_id):
+    """Lit les compteurs Redis seuls ; None s'ils sont absents ou illisibles"""
+    redis_client = get_redis()
+    if not redis_client:
+        return None
+    try:
+        values = redis_client.hgetall(_tally_key(quiz_id))
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des compteurs du quiz {quiz_id}: {str(e)}")
+        return None
+    if not values:
+        return None
+    values = {int(k): int(v) for k, v in values.items()}
+    return [values.get(i, 0) for i in range(max(values) + 1)]
+
+
+def get_tally(quiz):
+    """Retourne le nombre de réponses par option : compteurs Redis, repli SQL s'ils sont absents"""
+    counts = read_tally(quiz.id)
+    if counts is not None:
+        return (counts + [0] * len(quiz.options))[:len(quiz.options)]
+
+    redis_client = get_redis()
+    db_counts = count_from_stats([quiz.id]).get(quiz.id, {})
+    counts = [db_counts.get(i, 0) for i in range(len(quiz.options))]
+    try:
+        if redis_client and _backlog_empty(redis_client):
+            store_tally(quiz.id, counts)
+    except Exception as e:
+        logger.error(f"Erreur lors de la reconstruction des compteurs du quiz {quiz.id}: {str(e)}")
+    return counts
+
+
+def reconcile_tallies(app):
+    """Reconstruit depuis la base les compteurs des quiz des sessions en cours"""
+    with app.app_context():
+        try:
+            redis_client = get_redis()
+            if not redis_client:
+                return
+            if not _backlog_empty(redis_client):
+                logger.info("Réconciliation des compteurs reportée : des réponses sont en attente d'insertion")
+                return
+            quizzes = Quiz.query.join(Session).filter(Session.status == 'live').all()
+            if not quizzes:
+                return
+            db_counts = count_from_stats([quiz.id for quiz in quizzes])
+            for quiz in quizzes:
+                counts = db_counts.get(quiz.id, {})
+                store_tally(quiz.id, [counts.get(i, 0) for i in range(len(quiz.options))])
+        except Exception as e:
+            logger.error(f"Erreur générale dans reconcile_tallies: {str(e)}")
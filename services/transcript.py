@@ -0,0 +1,194 @@
+"""Transcript structuré et borné des sessions dans Redis.
+
+- `session:{id}:transcript` : hash question_id -> entrée JSON ; la réponse de
+  l'expert réécrit l'entrée en place ;
+- `session:{id}:transcript:ids` : index trié des questions, qui borne le hash à
+  TRANSCRIPT_MAX_QUESTIONS (les plus anciennes sont retirées) ;
+- `session:{id}:transcript:quiz` : stream des réponses aux quiz, plafonné par
+  MAXLEN ~ TRANSCRIPT_MAX_QUIZ_RESPONSES.
+
+Les clés portent un TTL de sécurité pendant la session ; à sa fin le transcript
+complet est archivé (JSON gzip) depuis la base puis les clés expirent après
+TRANSCRIPT_RETENTION_AFTER_END. Les archives vont dans TRANSCRIPT_ARCHIVE_DIR,
+qui ne doit pas être servi publiquement (pas sous media/, racine HTTP de SRS).
+"""
+import gzip
+import json
+import logging
+import os
+from flask import current_app
+from extensions import get_redis
+from models import Question, Quiz
+from services.tallies import count_from_stats
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_KEY = "session:{session_id}:transcript"
+TRANSCRIPT_INDEX_KEY = "session:{session_id}:transcript:ids"
+TRANSCRIPT_QUIZ_KEY = "session:{session_id}:transcript:quiz"
+
+# Écrit l'entrée, l'indexe par id puis retire les plus anciennes au-delà du plafond
+RECORD_LUA = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[1], ARGV[1])
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[3])
+if excess > 0 then
+    local oldest = redis.call('ZPOPMIN', KEYS[2], excess)
+    for i = 1, #oldest, 2 do
+        redis.call('HDEL', KEYS[1], oldest[i])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+_record_script = None
+
+
+def _keys(session_id):
+    session_id = int(session_id)
+    return (
+        TRANSCRIPT_KEY.format(session_id=session_id),
+        TRANSCRIPT_INDEX_KEY.format(session_id=session_id),
+        TRANSCRIPT_QUIZ_KEY.format(session_id=session_id)
+    )
+
+
+def _script(redis_client):
+    global _record_script
+    if _record_script is None:
+        _record_script = redis_client.register_script(RECORD_LUA)
+    return _record_script
+
+
+def _question_entry(question):
+    return {
+        'question_id': question.id,
+        'question_text': question.question_text,
+        'answer_text': question.answer_text,
+        'timestamp': question.timestamp.isoformat()
+    }
+
+
+def record_question(pipe, question):
+    """Ajoute (ou met à jour en place, pour une réponse) une question du transcript
+    dans le pipeline de l'appelant"""
+    if pipe is None:
+        return
+    transcript_key, index_key, _ = _keys(question.session_id)
+    _script(get_redis())(
+        keys=[transcript_key, index_key],
+        args=[
+            question.id,
+            json.dumps(_question_entry(question), separators=(',', ':')),
+            current_app.config['TRANSCRIPT_MAX_QUESTIONS'],
+            current_app.config['TRANSCRIPT_TTL']
+        ],
+        client=pipe
+    )
+
+
+def record_quiz_answer(pipe, session_id, quiz_id, selected_option, timestamp):
+    """Ajoute une réponse de quiz au stream plafonné du transcript"""
+    if pipe is None:
+        return
+    _, _, quiz_key = _keys(session_id)
+    pipe.xadd(quiz_key, {
+        'quiz_id': quiz_id,
+        'selected_option': selected_option,
+        'timestamp': timestamp.isoformat()
+    }, maxlen=current_app.config['TRANSCRIPT_MAX_QUIZ_RESPONSES'], approximate=True)
+    pipe.expire(quiz_key, current_app.config['TRANSCRIPT_TTL'])
+
+
+def _archive_path(session_id):
+    return os.path.join(current_app.config['TRANSCRIPT_ARCHIVE_DIR'], f"session_{int(session_id)}.json.gz")
+
+
+def build_archive(session_id):
+    """Transcript complet d'une session depuis la base (questions, réponses, résultats des quiz)"""
+    questions = Question.query.filter_by(session_id=session_id).order_by(Question.timestamp.asc(), Question.id.asc()).all()
+    quizzes = Quiz.query.filter_by(session_id=session_id).order_by(Quiz.timestamp.asc(), Quiz.id.asc()).all()
+    counts = count_from_stats([quiz.id for quiz in quizzes]) if quizzes else {}
+    return {
+        'session_id': int(session_id),
+        'questions': [_question_entry(question) for question in questions],
+        'quizzes': [{
+            'id': quiz.id,
+            'question': quiz.question,
+            'options': quiz.options,
+            'correct_answer': quiz.correct_answer,
+            'results': [counts.get(quiz.id, {}).get(i, 0) for i in range(len(quiz.options))],
+            'timestamp': quiz.timestamp.isoformat()
+        } for quiz in quizzes]
+    }
+
+
+def close_transcript(session_id):
+    """À la fin d'une session : archive le transcript compressé et fait expirer les clés Redis"""
+    try:
+        path = _archive_path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'wt', encoding='utf-8') as archive:
+            json.dump(build_archive(session_id), archive, separators=(',', ':'))
+    except Exception as e:
+        logger.error(f"Erreur lors de l'archivage du transcript de la session {session_id}: {str(e)}")
+        return
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            retention = current_app.config['TRANSCRIPT_RETENTION_AFTER_END']
+            pipe = redis_client.pipeline()
+            for key in _keys(session_id):
+                pipe.expire(key, retention)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Erreur lors de l'expiration du transcript de la session {session_id}: {str(e)}")
+
+
+def delete_transcript(session_id):
+    """Supprime le transcript et son archive (session supprimée)"""
+    redis_client = get_redis()
+    if redis_client:
+        try:
+            redis_client.delete(*_keys(session_id))
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression du transcript de la session {session_id}: {str(e)}")
+    try:
+        os.remove(_archive_path(session_id))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression de l'archive de la session {session_id}: {str(e)}")
+
+
+def get_transcript(session_id):
+    """Transcript d'une session : l'archive si la session est terminée, sinon Redis.
+    Retourne None si aucun des deux n'est disponible."""
+    path = _archive_path(session_id)
+    if os.path.exists(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            return json.load(archive)
+    redis_client = get_redis()
+    if not redis_client:
+        return None
+    transcript_key, index_key, quiz_key = _keys(session_id)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zrange(index_key, 0, -1)
+        pipe.hgetall(transcript_key)
+        pipe.xrange(quiz_key)
+        ids, entries, answers = pipe.execute()
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture du transcript de la session {session_id}: {str(e)}")
+        return None
+    return {
+        'session_id': int(session_id),
+        'questions': [json.loads(entries[question_id]) for question_id in ids if question_id in entries],
+        'quiz_responses': [{
+            'quiz_id': int(fields[b'quiz_id']),
+            'selected_option': int(fields[b'selected_option']),
+            'timestamp': fields[b'timestamp'].decode('utf-8')
+        } for _, fields in answers]
+    }
@@ -0,0 +1,80 @@
+import logging
+import queue
+import time
+from extensions import db, socketio
+from services.metrics import SOCKET_QUEUE_DEPTH, SOCKET_TASK_SECONDS, SOCKET_TASK_WAIT_SECONDS, SOCKET_TASKS_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+class SocketWorkPool:
+    """Pool borné de workers pour les écritures déclenchées par les événements Socket.IO.
+
+    Les gestionnaires d'événements acquittent tout de suite et déposent la
+    persistance dans une file de SOCKET_QUEUE_LIMIT tâches traitées par
+    SOCKET_WORKERS workers (au plus autant de connexions SQL simultanées).
+    File pleine : `submit` retourne False et l'appelant renvoie un ack d'erreur
+    au lieu de laisser la latence croître sans limite.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.size = app.config['SOCKET_WORKERS']
+        self._queue = queue.Queue(maxsize=app.config['SOCKET_QUEUE_LIMIT'])
+        self._running = False
+
+    def start(self):
+        self._running = True
+        for _ in range(self.size):
+            socketio.start_background_task(self._work)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, name, func, *args, **kwargs):
+        """Met une tâche en file. Retourne False si la file est pleine.
+        Pool non démarré (BACKGROUND_SERVICES=false) : la tâche s'exécute tout de suite."""
+        if not self._running:
+            self._execute(name, func, args, kwargs)
+            return True
+        try:
+            self._queue.put_nowait((name, func, args, kwargs, time.perf_counter()))
+        except queue.Full:
+            SOCKET_TASKS_REJECTED.labels(task=name).inc()
+            logger.warning(f"Pool Socket.IO saturé ({self.depth()} tâches en attente) : tâche {name} refusée")
+            return False
+        SOCKET_QUEUE_DEPTH.set(self.depth())
+        return True
+
+    def stop(self, timeout=10):
+        """Laisse les workers vider la file avant l'arrêt du processus"""
+        if not self._running:
+            return
+        deadline = time.monotonic() + timeout
+        # unfinished_tasks compte aussi les tâches en cours d'exécution
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._running = False
+        if self.depth():
+            logger.error(f"{self.depth()} tâches Socket.IO non traitées à l'arrêt")
+
+    def _work(self):
+        while self._running:
+            try:
+                name, func, args, kwargs, queued_at = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            SOCKET_QUEUE_DEPTH.set(self.depth())
+            SOCKET_TASK_WAIT_SECONDS.labels(task=name).observe(time.perf_counter() - queued_at)
+            self._execute(name, func, args, kwargs)
+            self._queue.task_done()
+
+    def _execute(self, name, func, args, kwargs):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erreur dans la tâche Socket.IO {name}: {str(e)}")
+        SOCKET_TASK_SECONDS.labels(task=name).observe(time.perf_counter() - started)
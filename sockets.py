@@ -1,84 +1,136 @@
+import logging
 from flask_socketio import join_room, leave_room, emit
-from flask import request
-from models import Question, QuizResponse, Session, Quiz, db
+from flask import request, current_app
+from models import Question, Session, db
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from extensions import redis_pipeline
+from services.snapshot import get_snapshot, invalidate_snapshot
+from services.responses import check_response, claim_answer, release_answer, enqueue_response
+from services.broadcast import record_answer
+from services.ratelimit import check_question_rate
+from services.transcript import record_question
+from services.monitoring import track_event
+from services.payloads import emit_to_session, emit_to_sid, session_room, compact_room, wants_compact
 
-def register_handlers(socketio, redis_client, db):
+# Connexions, entrées et sorties de salle : un enregistrement par téléviseur, échantillonné (LOG_SAMPLING)
+connection_logger = logging.getLogger('sockets.connections')
+
+OVERLOADED_ACK = {'status': 'error', 'message': 'Serveur surchargé, réessayez dans un instant', 'retry_after': 1}
+
+def _persist_question(session_id, question_text, sid, compact=False):
+    # Exécuté par le pool de workers, hors du gestionnaire d'événement
+    try:
+        question = Question(session_id=session_id, question_text=question_text, timestamp=datetime.now())
+        db.session.add(question)
+        db.session.commit()
+    except Exception:
+        emit_to_sid('question_error', {
+            'session_id': session_id,
+            'message': "La question n'a pas pu être enregistrée"
+        }, sid, compact=compact)
+        raise
+    with redis_pipeline() as pipe:
+        record_question(pipe, question)
+        invalidate_snapshot(session_id, pipe=pipe)
+    emit_to_session('new_question', {
+        'session_id': session_id,
+        'question_id': question.id,
+        'question_text': question_text,
+        'timestamp': question.timestamp
+    }, session_id)
+
+def _persist_response(session_id, quiz_id, selected_option, device_id, sid, compact=False):
+    # Exécuté par le pool : l'ack « queued » est déjà parti, un échec est signalé au client
+    try:
+        enqueue_response(quiz_id, selected_option, device_id=device_id, session_id=session_id)
+    except IntegrityError:
+        # Écriture synchrone (Redis indisponible) : réponse concurrente du même appareil
+        db.session.rollback()
+        emit_to_sid('quiz_response_error', {
+            'session_id': session_id,
+            'quiz_id': quiz_id,
+            'message': 'Vous avez déjà répondu à ce quiz'
+        }, sid, compact=compact)
+        return
+    except Exception:
+        if device_id:
+            release_answer(quiz_id, device_id)
+        emit_to_sid('quiz_response_error', {
+            'session_id': session_id,
+            'quiz_id': quiz_id,
+            'message': "La réponse n'a pas pu être enregistrée"
+        }, sid, compact=compact)
+        raise
+    record_answer(session_id, quiz_id)
+
+def register_handlers(socketio, db):
     @socketio.on('connect')
     def handle_connect():
-        print(f'Client connected: {request.sid}')
+        connection_logger.info('Client connecté', extra={'sid': request.sid})
 
     @socketio.on('join_session')
+    @track_event('join_session')
     def handle_join_session(data):
         session_id = data.get('session_id')
         if session_id:
-            join_room(f'session_{session_id}')
-            print(f'Client {request.sid} joined session {session_id}')
-            
-            questions = Question.query.filter_by(session_id=session_id).order_by(Question.timestamp.asc()).all()
-            for question in questions:
-                emit('new_question', {
-                    'session_id': session_id,
-                    'question_id': question.id,
-                    'question_text': question.question_text,
-                    'answer_text': question.answer_text,
-                    'timestamp': question.timestamp.isoformat()
-                }, room=request.sid)
+            # Salle selon l'encodage négocié à la connexion (?compact=1) : voir services/payloads.py
+            compact = wants_compact()
+            join_room(compact_room(session_id) if compact else session_room(session_id))
+            connection_logger.info('Client entré dans la session', extra={'sid': request.sid, 'session_id': session_id})
+            # Seuls les spectateurs (qui envoient leur device_id) sont comptés, pas la page de l'expert
+            if data.get('device_id'):
+                current_app.presence.join(request.sid, session_id, data['device_id'])
             
-            quizzes = Quiz.query.filter_by(session_id=session_id).order_by(Quiz.timestamp.desc()).all()
-            for quiz in quizzes:
-                emit('new_quiz', {
-                    'session_id': session_id,
-                    'id': quiz.id,
-                    'question': quiz.question,
-                    'options': quiz.options,
-                    'timestamp': quiz.timestamp.isoformat()
-                }, room=request.sid)
+            # Un seul message pré-sérialisé servi depuis Redis au lieu d'un emit par question/quiz
+            emit('session_snapshot', get_snapshot(session_id, compact=compact), room=request.sid)
 
     @socketio.on('leave_session')
+    @track_event('leave_session')
     def handle_leave_session(data):
         session_id = data.get('session_id')
         if session_id:
-            leave_room(f'session_{session_id}')
-            print(f'Client {request.sid} left session {session_id}')
+            leave_room(session_room(session_id))
+            leave_room(compact_room(session_id))
+            current_app.presence.leave(request.sid, session_id)
+            connection_logger.info('Client sorti de la session', extra={'sid': request.sid, 'session_id': session_id})
 
     @socketio.on('disconnect')
     def handle_disconnect():
-        print(f'Client disconnected: {request.sid}')
+        current_app.presence.disconnect(request.sid)
+        connection_logger.info('Client déconnecté', extra={'sid': request.sid})
 
     @socketio.on('question')
+    @track_event('question')
     def handle_question(data):
         session_id = data['session_id']
         question_text = data['question_text']
-        question = Question(session_id=session_id, question_text=question_text, timestamp=datetime.now())
-        db.session.add(question)
-        db.session.commit()
-        if redis_client:
-            redis_client.rpush(f"session:{session_id}:questions", f"Q:{question_text}|A:")
-        emit('new_question', {
-            'session_id': session_id,
-            'question_id': question.id,
-            'question_text': question_text,
-            'timestamp': question.timestamp.isoformat()
-        }, room=f'session_{session_id}')
+        allowed, retry_after = check_question_rate(session_id, data.get('device_id') or request.sid)
+        if not allowed:
+            return {'status': 'error', 'message': 'Trop de questions, réessayez plus tard', 'retry_after': retry_after}
+        if not current_app.socket_workers.submit('question', _persist_question, session_id, question_text, request.sid, wants_compact()):
+            return OVERLOADED_ACK
+        # La question est diffusée (new_question) une fois enregistrée par le pool
+        return {'status': 'queued'}
 
     @socketio.on('quiz_response')
+    @track_event('quiz_response')
     def handle_quiz_response(data):
         session_id = data['session_id']
         quiz_id = data['quiz_id']
         selected_option = data['selected_option']
-        response = QuizResponse(
-            quiz_id=quiz_id,
-            user_id=None,
-            selected_option=selected_option,
-            timestamp=datetime.now()
-        )
-        db.session.add(response)
-        db.session.commit()
-        if redis_client:
-            redis_client.rpush(f"session:{session_id}:quiz_responses", f"Q:{quiz_id}|A:{selected_option}")
-        emit('new_quiz_response', {
-            'session_id': session_id,
-            'quiz_id': quiz_id,
-            'selected_option': selected_option
-        }, room=f'session_{session_id}')
\ No newline at end of file
+        device_id = data.get('device_id')
+        try:
+            check_response(session_id, quiz_id, selected_option)
+        except (LookupError, ValueError) as e:
+            return {'status': 'error', 'message': str(e)}
+        # Réservation atomique dans Redis (première réponse gagnante), écriture dans le pool
+        if device_id and not claim_answer(quiz_id, device_id):
+            return {'status': 'error', 'message': 'Vous avez déjà répondu à ce quiz'}
+        if not current_app.socket_workers.submit('quiz_response', _persist_response, session_id, quiz_id, selected_option,
+                                                 device_id, request.sid, wants_compact()):
+            if device_id:
+                release_answer(quiz_id, device_id)
+            return OVERLOADED_ACK
+        # Réponse enregistrée par le pool ; en cas d'échec le client reçoit quiz_response_error
+        return {'status': 'queued'}
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""Application de test : SQLite temporaire, sans Redis ni tâches de fond.
+
+Config lit os.environ à l'import : l'environnement est fixé avant d'importer app.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('agri')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{workdir / 'test.db'}"
+    os.environ['SECRET_KEY'] = 'test'
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = ''
+    os.environ['BACKGROUND_SERVICES'] = 'false'
+    os.environ['TRANSCRIPT_ARCHIVE_DIR'] = str(workdir / 'transcripts')
+    # Port fermé : l'application fonctionne sans Redis (get_redis() renvoie None)
+    os.environ['REDIS_HOST'] = '127.0.0.1'
+    os.environ['REDIS_PORT'] = '1'
+    os.environ['LOG_LEVEL'] = 'WARNING'
+
+    import app as app_module
+    from extensions import db
+    application = app_module.create_app()
+    application.config['TESTING'] = True
+    with application.app_context():
+        db.create_all()
+    yield application
+
+
+@pytest.fixture
+def db(app):
+    """Base vidée après chaque test ; les requêtes du client de test ouvrent leur propre contexte"""
+    from extensions import db as database
+    yield database
+    with app.app_context():
+        database.drop_all()
+        database.create_all()
@@ -0,0 +1,72 @@
+"""Le tableau de bord d'administration émet un nombre de requêtes SQL indépendant du volume de données."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from models import User, Session, Question, Quiz, QuizResponse
+
+
+def seed(app, db, count):
+    """Ajoute `count` experts, chacun avec une session, une question, un quiz et deux réponses"""
+    now = datetime.utcnow()
+    with app.app_context():
+        for index in range(count):
+            suffix = f"{count}_{index}"
+            user = User(username=f"expert_{suffix}", email=f"expert_{suffix}@example.com",
+                        password_hash=generate_password_hash('x'), role='expert')
+            session = Session(title=f"Session {suffix}", start_time=now + timedelta(minutes=index),
+                              end_time=now + timedelta(hours=1), status='scheduled',
+                              stream_key=f"session_{suffix}", user=user)
+            quiz = Quiz(session=session, question='Culture ?', options=['Mil', 'Sorgho'], correct_answer=0)
+            db.session.add_all([
+                user,
+                session,
+                Question(session=session, question_text='Quand semer ?', timestamp=now),
+                quiz,
+                QuizResponse(quiz=quiz, selected_option=0, device_id=f"tv_a_{suffix}", timestamp=now),
+                QuizResponse(quiz=quiz, selected_option=1, device_id=f"tv_b_{suffix}", timestamp=now)
+            ])
+        db.session.commit()
+
+
+def dashboard_queries(app, db, admin_id):
+    """Requêtes SQL émises par un affichage du tableau de bord"""
+    statements = []
+
+    def on_query(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    client = app.test_client()
+    with client.session_transaction() as cookie:
+        cookie['_user_id'] = str(admin_id)
+        cookie['_fresh'] = True
+    event.listen(engine, 'before_cursor_execute', on_query)
+    try:
+        response = client.get('/admin/dashboard')
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_query)
+    assert response.status_code == 200
+    return statements
+
+
+def test_dashboard_query_count_does_not_grow_with_data(app, db):
+    # Page assez grande pour afficher toutes les lignes : une requête par ligne se verrait
+    app.config['ADMIN_PAGE_SIZE'] = 100
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com',
+                     password_hash=generate_password_hash('x'), role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+    seed(app, db, 3)
+    small = dashboard_queries(app, db, admin_id)
+    seed(app, db, 27)
+    large = dashboard_queries(app, db, admin_id)
+
+    with app.app_context():
+        assert User.query.count() == 31
+    assert len(large) == len(small), "\n\n".join(large)
@@ -0,0 +1,25 @@
+REMOTE = {'REMOTE_ADDR': '203.0.113.7'}
+
+
+def test_metrics_restricted_to_allowed_ips_and_token(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 's3cret')
+    monkeypatch.setitem(app.config, 'METRICS_ALLOWED_IPS', '127.0.0.1,::1,10.0.0.0/8')
+    client = app.test_client()
+
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 200
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 404
+    assert client.get('/metrics', environ_base=REMOTE,
+                      headers={'Authorization': 'Bearer autre'}).status_code == 404
+    response = client.get('/metrics', environ_base=REMOTE, headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+
+def test_metrics_without_token_only_allowlist(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', None)
+    monkeypatch.setitem(app.config, 'METRICS_ALLOWED_IPS', '127.0.0.1')
+    client = app.test_client()
+    assert client.get('/metrics', environ_base=REMOTE, headers={'Authorization': 'Bearer '}).status_code == 404
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '::1'}).status_code == 404
+    assert client.get('/metrics').status_code == 200
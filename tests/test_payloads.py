@@ -0,0 +1,18 @@
+import time
+from datetime import datetime, timezone
+
+from services.payloads import encode
+
+
+def test_compact_dates_are_utc_epoch(monkeypatch):
+    # Les datetime naïfs viennent de datetime.utcnow() : le fuseau du serveur ne doit pas décaler l'epoch
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    try:
+        payload = {'timestamp': datetime(2026, 1, 1), 'status': 'live'}
+        assert encode(payload, True) == {'ts': 1767225600, 'st': 'live'}
+        assert encode({'timestamp': datetime(2026, 1, 1, tzinfo=timezone.utc)}, True) == {'ts': 1767225600}
+        assert encode(payload) == {'timestamp': '2026-01-01T00:00:00', 'status': 'live'}
+    finally:
+        monkeypatch.undo()
+        time.tzset()
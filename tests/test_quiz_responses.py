@@ -0,0 +1,68 @@
+"""Réponses aux quiz sans tâches de fond ni Redis (BACKGROUND_SERVICES=false, voir conftest.py)."""
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from models import User, Session, Quiz, QuizResponse, QuizStats
+from services.analytics import init_quiz_stats
+
+
+def create_quiz(app, db):
+    with app.app_context():
+        user = User(username='expert', email='expert@example.com',
+                    password_hash=generate_password_hash('x'), role='expert')
+        session = Session(title='Session', start_time=datetime.utcnow(), end_time=datetime.utcnow() + timedelta(hours=1),
+                          status='live', stream_key='session_quiz', user=user)
+        quiz = Quiz(session=session, question='Culture ?', options=['Maïs', 'Mil', 'Sorgho'], correct_answer=1)
+        db.session.add_all([user, session, quiz])
+        db.session.flush()
+        init_quiz_stats(quiz)
+        db.session.commit()
+        return session.id, quiz.id
+
+
+def test_respond_records_answer_once(app, db):
+    session_id, quiz_id = create_quiz(app, db)
+    client = app.test_client()
+    url = f'/session/{session_id}/quiz/{quiz_id}/respond'
+
+    response = client.post(url, json={'device_id': 'tv-1', 'selected_option': 1})
+    assert response.status_code == 200
+    assert response.json['status'] == 'success'
+    assert response.json['is_correct'] is True
+
+    duplicate = client.post(url, json={'device_id': 'tv-1', 'selected_option': 0})
+    assert duplicate.status_code == 400
+    assert duplicate.json['message'] == 'Vous avez déjà répondu à ce quiz'
+
+    with app.app_context():
+        assert QuizResponse.query.filter_by(quiz_id=quiz_id).count() == 1
+        stats = db.session.get(QuizStats, quiz_id)
+        assert stats.option_counts == [0, 1, 0]
+        assert stats.total_responses == 1
+
+
+def test_respond_rejects_invalid_option_and_foreign_quiz(app, db):
+    session_id, quiz_id = create_quiz(app, db)
+    client = app.test_client()
+
+    invalid = client.post(f'/session/{session_id}/quiz/{quiz_id}/respond', json={'device_id': 'tv-1', 'selected_option': 3})
+    assert invalid.status_code == 400
+    foreign = client.post(f'/session/{session_id + 1}/quiz/{quiz_id}/respond', json={'device_id': 'tv-1', 'selected_option': 0})
+    assert foreign.status_code == 404
+    with app.app_context():
+        assert QuizResponse.query.count() == 0
+
+
+def test_socket_answer_join_and_disconnect(app, db):
+    from extensions import socketio
+    session_id, quiz_id = create_quiz(app, db)
+    client = socketio.test_client(app)
+    client.emit('join_session', {'session_id': session_id, 'device_id': 'tv-2'}, callback=True)
+    ack = client.emit('quiz_response', {'session_id': session_id, 'quiz_id': quiz_id,
+                                        'selected_option': 0, 'device_id': 'tv-2'}, callback=True)
+    assert ack == {'status': 'queued'}
+    assert 'quiz_tally' in [message['name'] for message in client.get_received()]
+    client.disconnect()
+    with app.app_context():
+        assert QuizResponse.query.filter_by(quiz_id=quiz_id, device_id='tv-2').count() == 1
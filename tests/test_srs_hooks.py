@@ -0,0 +1,123 @@
+"""Callbacks SRS (http_hooks) rejoués par le client de test, comme scripts/fake_srs.py.
+
+Sans Redis (conftest.py), la fin de diffusion ne peut pas être différée : le délai
+de grâce est vérifié en appelant directement end_dropped_streams sur un Redis
+remplacé par fakeredis quand il est installé.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import User, Session
+from services.streams import STREAM_DOWN_KEY, end_dropped_streams
+
+ACCEPT, REJECT = 0, 1
+
+
+def hook(client, action, stream):
+    response = client.post(f'/srs/on_{action}', json={
+        'action': f'on_{action}',
+        'client_id': 'fake',
+        'ip': '127.0.0.1',
+        'vhost': '__defaultVhost__',
+        'app': 'live',
+        'tcUrl': 'rtmp://127.0.0.1:1935/live',
+        'stream': stream,
+        'param': ''
+    })
+    assert response.status_code == 200
+    return response.json['code']
+
+
+def create_session(app, db, stream_key, status='scheduled', ends_in=timedelta(hours=1)):
+    with app.app_context():
+        user = User.query.filter_by(username='expert').first() or User(
+            username='expert', email='expert@example.com', password_hash=generate_password_hash('x'), role='expert')
+        session = Session(title=stream_key, start_time=datetime.utcnow(), end_time=datetime.utcnow() + ends_in,
+                          status=status, stream_key=stream_key, user=user)
+        db.session.add(session)
+        db.session.commit()
+        return session.id
+
+
+def status_of(app, db, session_id):
+    with app.app_context():
+        return db.session.get(Session, session_id).status
+
+
+@pytest.fixture
+def fake_redis(app):
+    """Redis en mémoire (fakeredis) pour les tests qui ont besoin du délai de grâce"""
+    fakeredis = pytest.importorskip('fakeredis')
+    previous = app.extensions.get('redis')
+    app.extensions['redis'] = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    yield app.extensions['redis']
+    app.extensions['redis'] = previous
+
+
+def test_publish_makes_scheduled_session_live(app, db):
+    session_id = create_session(app, db, 'session_publish')
+    client = app.test_client()
+    assert hook(client, 'play', 'session_publish') == REJECT
+    assert hook(client, 'publish', 'session_publish') == ACCEPT
+    assert status_of(app, db, session_id) == 'live'
+    assert hook(client, 'play', 'session_publish') == ACCEPT
+    # Reconnexion de l'encodeur : acceptée
+    assert hook(client, 'publish', 'session_publish') == ACCEPT
+
+
+def test_unknown_stream_key_is_rejected(app, db):
+    client = app.test_client()
+    assert hook(client, 'publish', 'session_inconnue') == REJECT
+    assert hook(client, 'play', 'session_inconnue') == REJECT
+    assert hook(client, 'unpublish', 'session_inconnue') == ACCEPT
+
+
+def test_ended_or_expired_session_is_not_reopened(app, db):
+    ended_id = create_session(app, db, 'session_ended', status='ended')
+    expired_id = create_session(app, db, 'session_expired', ends_in=timedelta(hours=-1))
+    client = app.test_client()
+    assert hook(client, 'publish', 'session_ended') == REJECT
+    assert hook(client, 'publish', 'session_expired') == REJECT
+    assert status_of(app, db, ended_id) == 'ended'
+    assert status_of(app, db, expired_id) == 'scheduled'
+
+
+def test_unpublish_without_redis_ends_session_and_it_stays_ended(app, db):
+    session_id = create_session(app, db, 'session_down')
+    client = app.test_client()
+    assert hook(client, 'publish', 'session_down') == ACCEPT
+    assert hook(client, 'unpublish', 'session_down') == ACCEPT
+    assert status_of(app, db, session_id) == 'ended'
+    assert hook(client, 'publish', 'session_down') == REJECT
+    assert status_of(app, db, session_id) == 'ended'
+
+
+def test_unpublish_ends_session_only_after_grace_period(app, db, fake_redis, monkeypatch):
+    monkeypatch.setitem(app.config, 'SRS_UNPUBLISH_GRACE', 30)
+    session_id = create_session(app, db, 'session_grace')
+    dropped_id = create_session(app, db, 'session_dropped')
+    client = app.test_client()
+    for stream in ('session_grace', 'session_dropped'):
+        assert hook(client, 'publish', stream) == ACCEPT
+        assert hook(client, 'unpublish', stream) == ACCEPT
+
+    assert fake_redis.zcard(STREAM_DOWN_KEY) == 2
+
+    # Pendant le délai : toujours en direct, les spectateurs sont acceptés
+    with app.app_context():
+        assert end_dropped_streams() == []
+    assert status_of(app, db, session_id) == 'live'
+    assert hook(client, 'play', 'session_grace') == ACCEPT
+
+    # Republication dans le délai : la fin en attente est annulée
+    assert hook(client, 'publish', 'session_grace') == ACCEPT
+    with app.app_context():
+        assert end_dropped_streams(time.time() + 60) == [dropped_id]
+    assert fake_redis.zcard(STREAM_DOWN_KEY) == 0
+    assert status_of(app, db, session_id) == 'live'
+    assert status_of(app, db, dropped_id) == 'ended'
+    assert hook(client, 'play', 'session_dropped') == REJECT
+    assert hook(client, 'publish', 'session_dropped') == REJECT